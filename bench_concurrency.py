@@ -0,0 +1,103 @@
+# Course: CS261 - Data Structures
+# Author: Tristan Howell
+# Assignment: Assignment 6: Graph Data Structures
+# Description: Measure query throughput of threads reading a graph while another thread keeps changing it
+
+import argparse
+import random
+import threading
+import time
+
+from d_graph import DirectedGraph
+from ud_graph import UndirectedGraph
+
+
+def build_graphs(v_count: int, e_count: int, seed: int):
+    """
+    Accepts the vertex and edge counts and a random seed
+
+    Returns a tuple of a sparse DirectedGraph and an UndirectedGraph over the same random edges
+    """
+    rng = random.Random(seed)
+    edges = [(rng.randrange(v_count), rng.randrange(v_count), rng.randint(1, 100)) for _ in range(e_count)]
+    directed = DirectedGraph.from_edges(edges, storage='sparse', v_count=v_count)
+    undirected = UndirectedGraph.from_edges((str(src), str(dst)) for src, dst, _ in edges)
+    return directed, undirected
+
+
+def run(graph, query, readers: int, duration: float, mode: str, batch_size: int, interval: float):
+    """
+    Accepts a graph, a query(graph, rng) function, the number of reader threads, how many seconds to run, and the mode:
+    'snapshot' readers query graph.snapshot() without locking, 'locked' readers hold the graph's lock around each query
+    on the graph itself
+    One writer thread changes the graph the whole time, batch_size random edge changes at a time every interval seconds
+
+    Returns a tuple of the queries answered per second across all readers and the batches written per second
+    """
+    stop = threading.Event()
+    counts = [0] * readers
+    batches = 0
+    directed = isinstance(graph, DirectedGraph)
+    v_count = graph.v_count if directed else len(graph.get_vertices())
+
+    def writer():
+        nonlocal batches
+        rng = random.Random(0)
+        while not stop.is_set():
+            with graph.batch():
+                for _ in range(batch_size):
+                    src, dst = rng.randrange(v_count), rng.randrange(v_count)
+                    old_src, old_dst = rng.randrange(v_count), rng.randrange(v_count)
+                    if directed:
+                        graph.add_edge(src, dst, rng.randint(1, 100))
+                        graph.remove_edge(old_src, old_dst)
+                    else:
+                        graph.add_edge(str(src), str(dst))
+                        graph.remove_edge(str(old_src), str(old_dst))
+            batches += 1
+            time.sleep(interval)
+
+    def reader(slot):
+        rng = random.Random(slot + 1)
+        while not stop.is_set():
+            if mode == 'snapshot':
+                query(graph.snapshot(), rng)
+            else:
+                with graph._lock:
+                    query(graph, rng)
+            counts[slot] += 1
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / duration, batches / duration
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='reader throughput under a concurrent writer')
+    parser.add_argument('--vertices', type=int, default=2000)
+    parser.add_argument('--edges', type=int, default=10000)
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds per measurement')
+    parser.add_argument('--readers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--batch-size', type=int, default=50, help='edge changes per writer batch')
+    parser.add_argument('--interval', type=float, default=0.05, help='seconds the writer waits between batches')
+    args = parser.parse_args()
+
+    directed, undirected = build_graphs(args.vertices, args.edges, seed=1)
+    queries = {
+        'DirectedGraph.dijkstra': (directed, lambda g, rng: g.dijkstra(rng.randrange(g.v_count))),
+        'UndirectedGraph.dfs': (undirected, lambda g, rng: g.dfs(str(rng.randrange(args.vertices)))),
+    }
+    print(f'{args.vertices} vertices, {args.edges} edges, '
+          f'writer changing {args.batch_size} edges per batch every {args.interval}s')
+    for name, (graph, query) in queries.items():
+        print(f'\n{name}, queries and writer batches per second')
+        print(f'{"readers":>8} {"locked":>10} {"batches":>8} {"snapshot":>10} {"batches":>8}')
+        for readers in args.readers:
+            locked = run(graph, query, readers, args.duration, 'locked', args.batch_size, args.interval)
+            snapshot = run(graph, query, readers, args.duration, 'snapshot', args.batch_size, args.interval)
+            print(f'{readers:>8} {locked[0]:>10.1f} {locked[1]:>8.1f} {snapshot[0]:>10.1f} {snapshot[1]:>8.1f}')
@@ -4,7 +4,24 @@
 # Description: Implement a directed graph data structure
 
 import heapq
+import math
+import os
+import threading
+from array import array
+from bisect import bisect_left
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from graph_cache import ResultCache, cached
+from graph_lock import locked, writing
+from graph_io import DIRECTED, read_csr, read_edge_list, write_csr
+
+try:
+    import numpy as np
+except ImportError:
+    # only the bulk numpy methods need it
+    np = None
 
 class DirectedGraph:
     """
@@ -15,29 +32,58 @@ class DirectedGraph:
     - vertex names are integers
     """
 
-    def __init__(self, start_edges=None):
+    def __init__(self, start_edges=None, storage='matrix', reverse_index=False):
         """
-        Store graph info as adjacency matrix
-        DO NOT CHANGE THIS METHOD IN ANY WAY
+        Store graph info as adjacency matrix, as a list of per-vertex neighbor dicts when storage is 'sparse', or as one
+        contiguous int32 array of capacity x capacity cells (integer weights only) when storage is 'array'
+        With reverse_index the in-edges of every vertex are also kept up to date on each change (see
+        enable_reverse_index())
         """
+        if storage not in ('matrix', 'sparse', 'array'):
+            raise ValueError(f"unknown storage '{storage}', expected 'matrix', 'sparse' or 'array'")
+        self.storage = storage
         self.v_count = 0
-        self.adj_matrix = []
+        # only one of these is used, depending on the storage mode
+        self.adj_matrix = [] if storage == 'matrix' else None
+        self.adj_list = [] if storage == 'sparse' else None
+        # ascending neighbor list per vertex in sparse storage, rebuilt lazily after that vertex's edges change
+        self._sorted = [] if storage == 'sparse' else None
+        self.adj_cells = array('i') if storage == 'array' else None
+        # read-only (offsets, targets, weights) views, only set by load() with mmap
+        self.adj_csr = None
+        # row length of adj_cells, the cell for src -> dst is at src * _capacity + dst
+        self._capacity = 0
+        # in-edges per vertex, built on first use and dropped whenever the edges change unless _track_reverse is set,
+        # in which case every change updates it in place
+        self._track_reverse = reverse_index
+        self._reverse = [] if reverse_index else None
+        # bumped on every change so cached results from before it are never returned
+        self._version = 0
+        self._cache = None
+        # held by every change, re-entrant so batch() can group several of them
+        self._lock = threading.RLock()
+        # depth of the changes in progress, and the version the last one to finish left the graph at
+        self._writers = 0
+        self._published = 0
+        # read-only copy handed out by snapshot(), reused until the graph next changes
+        self._snapshot = None
+        self._read_only = False
+        # per-vertex flags of the rows (and reverse rows) the last snapshot shares with this graph, a flagged row is
+        # copied before its first change so the snapshot never sees it change
+        self._shared = None
+        self._shared_reverse = None
+        # (version, sorted edge keys) last built by _edge_keys()
+        self._keys = None
 
         # populate graph with initial vertices and edges (if provided)
         # before using, implement add_vertex() and add_edge() methods
+        # storage is sized once for the largest vertex, vertex 0 always exists
         if start_edges is not None:
-            v_count = 0
-            for u, v, _ in start_edges:
-                v_count = max(v_count, u, v)
-            for _ in range(v_count + 1):
-                self.add_vertex()
-            for u, v, weight in start_edges:
-                self.add_edge(u, v, weight)
+            self.add_edges_bulk(start_edges, v_count=1)
 
     def __str__(self):
         """
         Return content of the graph in human-readable form
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
         if self.v_count == 0:
             return 'EMPTY GRAPH\n'
@@ -45,7 +91,7 @@ class DirectedGraph:
         out += ' '.join(['{:2}'.format(i) for i in range(self.v_count)]) + '\n'
         out += '-' * (self.v_count * 3 + 3) + '\n'
         for i in range(self.v_count):
-            row = self.adj_matrix[i]
+            row = self._row(i)
             out += '{:2} |'.format(i)
             out += ' '.join(['{:2}'.format(w) for w in row]) + '\n'
         out = f"GRAPH ({self.v_count} vertices):\n{out}"
@@ -53,51 +99,677 @@ class DirectedGraph:
 
     # ------------------------------------------------------------------ #
 
+    def _row(self, v: int) -> []:
+        """
+        Accepts a vertex and builds its full row of weights, 0 where there is no edge
+
+        Returns list of v_count weights
+        """
+        if self.storage == 'matrix':
+            return self.adj_matrix[v]
+        if self.storage == 'array':
+            start = v * self._capacity
+            return self.adj_cells[start:start + self.v_count].tolist()
+        row = [0] * self.v_count
+        for dst, weight in self._neighbors(v):
+            row[dst] = weight
+        return row
+
+    def _neighbors(self, v: int):
+        """
+        Accepts a vertex and finds its outgoing edges without scanning a full row in sparse storage
+
+        Returns iterable of (dst, weight) pairs
+        """
+        if self.storage == 'matrix':
+            return [(dst, weight) for dst, weight in enumerate(self.adj_matrix[v]) if weight]
+        if self.storage == 'array':
+            start = v * self._capacity
+            return [(dst, weight) for dst, weight in enumerate(self.adj_cells[start:start + self.v_count]) if weight]
+        if self.storage == 'csr':
+            offsets, targets, weights, whole = self.adj_csr
+            start, end = offsets[v], offsets[v + 1]
+            if whole is None:
+                return zip(targets[start:end], weights[start:end])
+            return [(dst, int(weight) if flag else weight)
+                    for dst, weight, flag in zip(targets[start:end], weights[start:end], whole[start:end])]
+        return self.adj_list[v].items()
+
+    def _targets(self, v: int, ordered=True):
+        """
+        Accepts a vertex and whether its neighbors are needed in ascending order
+        Matrix, array and mapped storage already hold them in order, sparse storage keeps a sorted copy per vertex
+        that is only rebuilt after that vertex's edges change
+
+        Returns sequence of the vertices v has an edge to
+        """
+        if self.storage == 'sparse':
+            if not ordered:
+                return self.adj_list[v]
+            if self._sorted[v] is None:
+                self._sorted[v] = sorted(self.adj_list[v])
+            return self._sorted[v]
+        if self.storage == 'csr':
+            offsets, targets = self.adj_csr[:2]
+            return targets[offsets[v]:offsets[v + 1]]
+        return [dst for dst, _ in self._neighbors(v)]
+
+    def _reverse_neighbors(self, v: int):
+        """
+        Accepts a vertex and finds its incoming edges, building the reverse adjacency lists first if needed
+
+        Returns iterable of (src, weight) pairs
+        """
+        if self._reverse is None:
+            self._build_reverse()
+        return self._reverse[v].items()
+
+    def _build_reverse(self) -> None:
+        """
+        Accepts no parameters and builds the reverse adjacency lists from scratch in one pass over the edges
+
+        No returns
+        """
+        # filled in before it is published, so a reader of a shared snapshot never sees it half built
+        reverse = [{} for _ in range(self.v_count)]
+        for src in range(self.v_count):
+            for dst, weight in self._neighbors(src):
+                reverse[dst][src] = weight
+        self._reverse = reverse
+        self._shared_reverse = None
+
+    def _set_reverse(self, src: int, dst: int, weight) -> None:
+        """
+        Accepts an edge and its new weight (0 once removed), and mirrors it in the reverse adjacency lists when they
+        are kept up to date, otherwise drops them to be rebuilt on next use
+
+        No returns
+        """
+        if not self._track_reverse:
+            self._reverse = None
+            return
+        shared = self._shared_reverse
+        if shared is not None and dst < len(shared) and shared[dst]:
+            shared[dst] = 0
+            self._reverse[dst] = dict(self._reverse[dst])
+        if weight:
+            self._reverse[dst][src] = weight
+        else:
+            self._reverse[dst].pop(src, None)
+
+    def _own_row(self, v: int) -> None:
+        """
+        Accepts a vertex and, if the last snapshot shares its matrix row or neighbor dict, gives this graph its own copy
+        before the row is changed
+
+        No returns
+        """
+        shared = self._shared
+        if shared is not None and v < len(shared) and shared[v]:
+            shared[v] = 0
+            if self.storage == 'sparse':
+                self.adj_list[v] = dict(self.adj_list[v])
+            else:
+                self.adj_matrix[v] = list(self.adj_matrix[v])
+
+    def _to_csr(self):
+        """
+        Accepts no parameters and packs the edges into compressed sparse row arrays, the out-edges of vertex v being
+        targets[offsets[v]:offsets[v + 1]] with matching weights
+
+        Returns a tuple of (offsets, targets, weights) typed arrays and, when int and float weights are mixed, bytes
+        flagging the edges whose weight is an int, otherwise None
+        """
+        offsets = array('q', [0])
+        targets = array('q')
+        weights = []
+        for src in range(self.v_count):
+            for dst, weight in sorted(self._neighbors(src)):
+                targets.append(dst)
+                weights.append(weight)
+            offsets.append(len(targets))
+        # keep integer weights as integers so distances come back the same type
+        whole = bytes(type(weight) is int for weight in weights)
+        if all(whole):
+            return offsets, targets, array('q', weights), None
+        return offsets, targets, array('d', weights), whole if any(whole) else None
+
+    @classmethod
+    def _from_csr(cls, offsets, targets, weights, whole=None, read_only=False):
+        """
+        Accepts compressed sparse row arrays and int flags as built by _to_csr(), and whether to use them in place as
+        read-only storage instead of copying them
+
+        Returns a new DirectedGraph with those edges, sparse unless read_only
+        """
+        graph = cls(storage='sparse')
+        if read_only:
+            graph.storage = 'csr'
+            graph.adj_list = None
+            graph._sorted = None
+            graph.adj_csr = (offsets, targets, weights, whole)
+            graph.v_count = len(offsets) - 1
+            return graph
+        if whole is not None:
+            weights = [int(weight) if flag else weight for weight, flag in zip(weights, whole)]
+        for src in range(len(offsets) - 1):
+            start, end = offsets[src], offsets[src + 1]
+            graph.adj_list.append(dict(zip(targets[start:end], weights[start:end])))
+        graph._sorted = [None] * (len(offsets) - 1)
+        graph.v_count = len(offsets) - 1
+        return graph
+
+    def _weight(self, src: int, dst: int) -> int:
+        """
+        Accepts two ints representing vertices
+
+        Returns the weight of the edge between them, 0 if there is no edge
+        """
+        if self.storage == 'matrix':
+            return self.adj_matrix[src][dst]
+        if self.storage == 'array':
+            return self.adj_cells[src * self._capacity + dst]
+        if self.storage == 'csr':
+            # targets are sorted within each row
+            offsets, targets, weights, whole = self.adj_csr
+            pos = bisect_left(targets, dst, offsets[src], offsets[src + 1])
+            if pos == offsets[src + 1] or targets[pos] != dst:
+                return 0
+            return int(weights[pos]) if whole is not None and whole[pos] else weights[pos]
+        return self.adj_list[src].get(dst, 0)
+
+    def _cells(self):
+        """
+        Accepts no parameters, for matrix and array storage only
+
+        Returns v_count x v_count numpy array of the edge weights, a view of the buffer itself in array storage
+        """
+        n = self.v_count
+        if self.storage == 'matrix':
+            return np.array(self.adj_matrix).reshape(n, n)
+        return np.frombuffer(self.adj_cells, dtype=np.int32).reshape(self._capacity, self._capacity)[:n, :n]
+
+    def _first_invalid(self, path) -> int:
+        """
+        Accepts a path list and walks it with one edge lookup per hop
+
+        Returns the position of the first vertex in path that is not in the graph or has no edge to it from the one
+        before, -1 if the whole path is valid
+        """
+        n = self.v_count
+        for position, v in enumerate(path):
+            if not 0 <= v < n:
+                return position
+            if position and not self._weight(path[position - 1], v):
+                return position
+        return -1
+
+    def _edge_keys(self):
+        """
+        Accepts no parameters, for sparse and mapped storage, and keeps the keys until the graph next changes so
+        repeated calls do not rebuild them
+
+        Returns sorted numpy array of the src * v_count + dst key of every edge
+        """
+        version = self._version
+        if self._keys is None or self._keys[0] != version:
+            # edge_arrays() lists edges sorted by src then dst, so their keys come out sorted too
+            edge_src, edge_dst, _ = self.edge_arrays()
+            self._keys = (version, edge_src * self.v_count + edge_dst)
+        return self._keys[1]
+
+    def _check_writable(self) -> None:
+        """
+        Accepts no parameters and refuses changes to a snapshot() or a graph mapped read-only from a file
+
+        No returns
+        """
+        if self._read_only:
+            raise TypeError('graph is a read-only snapshot, change the graph it was taken from')
+        if self.storage == 'csr':
+            raise TypeError('graph is mapped read-only from a file, load it with mmap=False to change it')
+
+    def _reserve(self, capacity: int) -> None:
+        """
+        Accepts a vertex count and grows the array storage to hold at least that many vertices, copying each row of
+        the old buffer into the new one
+        Each growth also widens every row by at least sqrt(2), so growing one vertex or one batch at a time copies the
+        buffer O(log n) times while it never holds more than about twice the cells needed
+
+        No returns
+        """
+        if capacity <= self._capacity:
+            return
+        capacity = max(capacity, math.isqrt(2 * self._capacity * self._capacity))
+        old_cells, old_capacity = self.adj_cells, self._capacity
+        # new cells start zeroed, so new rows and columns begin with no edges
+        self.adj_cells = array('i', [0]) * (capacity * capacity)
+        for v in range(self.v_count):
+            self.adj_cells[v * capacity:v * capacity + self.v_count] = \
+                old_cells[v * old_capacity:v * old_capacity + self.v_count]
+        self._capacity = capacity
+
+    def _grow(self, v_count: int) -> None:
+        """
+        Accepts a vertex count and adds vertices until the graph has that many, allocating the storage in one step
+
+        No returns
+        """
+        if v_count <= self.v_count:
+            return
+        self._version += 1
+        added = v_count - self.v_count
+        if self._track_reverse:
+            self._reverse.extend({} for _ in range(added))
+        else:
+            self._reverse = None
+        if self.storage == 'matrix':
+            for v in range(self.v_count):
+                self._own_row(v)
+                self.adj_matrix[v].extend([0] * added)
+            self.adj_matrix.extend([0] * v_count for _ in range(added))
+        elif self.storage == 'sparse':
+            self.adj_list.extend({} for _ in range(added))
+            self._sorted.extend([None] * added)
+        else:
+            self._reserve(v_count)
+        self.v_count = v_count
+
+    @locked
     def add_vertex(self) -> int:
         """
         Create new nested list in the matrix and extend all previous lists as not being an edge of the newest vertex
+        In sparse storage only an empty neighbor dict is added for the newest vertex, and array storage only copies
+        its buffer when it runs out of capacity (see _reserve())
 
         Returns the number of vertices in the graph
         """
+        self._check_writable()
+        self._version += 1
+        if self._track_reverse:
+            self._reverse.append({})
+        else:
+            self._reverse = None
+        if self.storage == 'sparse':
+            self.adj_list.append({})
+            self._sorted.append(None)
+            self.v_count += 1
+            return self.v_count
+
+        if self.storage == 'array':
+            self._reserve(self.v_count + 1)
+            self.v_count += 1
+            return self.v_count
+
         # add the newest list
         self.adj_matrix.append([0 for i in range(len(self.adj_matrix))])
         # add a new column to each list including the newest
-        for list in self.adj_matrix:
-            list.append(0)
+        for v in range(self.v_count):
+            self._own_row(v)
+            self.adj_matrix[v].append(0)
+        self.adj_matrix[-1].append(0)
 
         self.v_count += 1
         return self.v_count
 
+    @locked
     def add_edge(self, src: int, dst: int, weight=1) -> None:
         """
         Accepts two ints representing vertices and adds a weight representing an edge between them
 
         No returns
         """
+        self._check_writable()
         if weight < 0 or src == dst:
             return
 
-        if src >= self.v_count or dst >= self.v_count:
+        if src < 0 or dst < 0 or src >= self.v_count or dst >= self.v_count:
+            return
+
+        self._set_reverse(src, dst, weight)
+        self._own_row(src)
+        self._version += 1
+        if self.storage == 'sparse':
+            self._sorted[src] = None
+            # a weight of 0 means no edge, same as an empty matrix cell
+            if weight:
+                self.adj_list[src][dst] = weight
+            else:
+                self.adj_list[src].pop(dst, None)
+            return
+
+        if self.storage == 'array':
+            self.adj_cells[src * self._capacity + dst] = weight
             return
 
         # src is the list and dst is the index in that list
         self.adj_matrix[src][dst] = weight
 
 
+    @locked
+    def add_edges_bulk(self, edges, v_count=None) -> None:
+        """
+        Accepts an iterable of (src, dst) or (src, dst, weight) edges, or a numpy array with those 2 or 3 columns, and
+        an optional minimum vertex count
+        Grows the graph once to fit the largest vertex, then writes the edges straight into storage, skipping loops and
+        negative weights like add_edge does (numpy arrays are checked as whole columns, repeated edges keep the last)
+
+        No returns
+        """
+        self._check_writable()
+        if np is not None and isinstance(edges, np.ndarray):
+            self._add_edges_array(edges, v_count or 0)
+            return
+
+        edges = edges if isinstance(edges, (list, tuple)) else list(edges)
+        largest = (v_count or 0) - 1
+        for edge in edges:
+            largest = max(largest, edge[0], edge[1])
+        self._grow(largest + 1)
+        self._version += 1
+        track = self._track_reverse
+        if not track:
+            self._reverse = None
+        shared = self._shared
+
+        for edge in edges:
+            src, dst = edge[0], edge[1]
+            weight = edge[2] if len(edge) > 2 else 1
+            if weight < 0 or src == dst or src < 0 or dst < 0:
+                continue
+            if track:
+                self._set_reverse(src, dst, weight)
+            if shared is not None:
+                self._own_row(src)
+            if self.storage == 'matrix':
+                self.adj_matrix[src][dst] = weight
+            elif self.storage == 'array':
+                self.adj_cells[src * self._capacity + dst] = weight
+            else:
+                self._sorted[src] = None
+                if weight:
+                    self.adj_list[src][dst] = weight
+                else:
+                    self.adj_list[src].pop(dst, None)
+
+    def _add_edges_array(self, edges, v_count: int) -> None:
+        """
+        Accepts a numpy array of (src, dst[, weight]) rows and a minimum vertex count, and filters, sizes and
+        deduplicates the edges with whole-column operations before writing them
+
+        No returns
+        """
+        if not edges.size:
+            # no rows at all, whatever the shape
+            edges = edges.reshape(0, 2)
+        elif edges.ndim != 2 or edges.shape[1] < 2:
+            raise ValueError(f'expected an array of (src, dst[, weight]) rows, got shape {edges.shape}')
+        src = edges[:, 0].astype(np.int64)
+        dst = edges[:, 1].astype(np.int64)
+        weight = edges[:, 2] if edges.shape[1] > 2 else np.ones(len(edges), dtype=np.int64)
+        keep = (src >= 0) & (dst >= 0) & (src != dst) & (weight >= 0)
+        src, dst, weight = src[keep], dst[keep], weight[keep]
+
+        # int32 cells would silently truncate or wrap these, refuse them the way add_edge does before changing anything
+        if self.storage == 'array' and len(weight):
+            if weight.dtype.kind not in 'iub':
+                raise TypeError(f'array storage holds integer weights only, got {weight.dtype}')
+            if weight.max() > np.iinfo(np.int32).max:
+                raise OverflowError(f'weight {weight.max()} does not fit in array storage (int32)')
+
+        if len(edges):
+            v_count = max(v_count, int(max(edges[:, 0].max(), edges[:, 1].max())) + 1)
+        self._grow(v_count)
+        self._version += 1
+        # the last copy of a repeated edge wins, same as calling add_edge in order
+        cells = src * self.v_count + dst
+        _, last = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - last
+        src, dst, weight = src[last], dst[last], weight[last]
+
+        if self.storage == 'array':
+            np.frombuffer(self.adj_cells, dtype=np.int32)[src * self._capacity + dst] = weight
+            if self._track_reverse:
+                for edge in zip(src.tolist(), dst.tolist(), weight.tolist()):
+                    self._set_reverse(*edge)
+            else:
+                self._reverse = None
+            return
+        self.add_edges_bulk(zip(src.tolist(), dst.tolist(), weight.tolist()))
+
+    @classmethod
+    def from_edges(cls, edges, storage='matrix', v_count=None):
+        """
+        Accepts edges in any form add_edges_bulk() takes, the storage mode, and an optional minimum vertex count
+
+        Returns a new DirectedGraph holding those edges
+        """
+        graph = cls(storage=storage)
+        graph.add_edges_bulk(edges, v_count)
+        return graph
+
+    @classmethod
+    def from_edge_file(cls, path, storage='matrix', delimiter=None, batch_size=100000, progress=None):
+        """
+        Accepts a text file of 'src dst [weight]' lines (csv, tsv or whitespace separated, optionally .gz), the storage
+        mode, and the delimiter, batch size and progress callback options of graph_io.read_edge_list()
+        The file is streamed in batches through add_edges_bulk(), never held in memory whole
+
+        Returns a new DirectedGraph holding those edges
+        """
+        graph = cls(storage=storage)
+        for batch in read_edge_list(path, DIRECTED, delimiter, batch_size, progress=progress):
+            graph.add_edges_bulk(batch)
+        return graph
+
+    @locked
     def remove_edge(self, src: int, dst: int) -> None:
         """
         Accepts two ints representing vertices and removes the weight representing an edge between them
 
         No returns
         """
+        self._check_writable()
         if src < 0 or dst < 0:
             return
 
         if src >= self.v_count or dst >= self.v_count:
             return
 
+        self._set_reverse(src, dst, 0)
+        self._own_row(src)
+        self._version += 1
+        if self.storage == 'sparse':
+            self._sorted[src] = None
+            self.adj_list[src].pop(dst, None)
+            return
+
+        if self.storage == 'array':
+            self.adj_cells[src * self._capacity + dst] = 0
+            return
+
         self.adj_matrix[src][dst] = 0
 
+    def save(self, path) -> None:
+        """
+        Accepts a file path and writes the graph to it as compressed sparse row arrays (see graph_io)
+
+        No returns
+        """
+        write_csr(path, DIRECTED, *self._to_csr())
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Accepts a file path written by save() and whether to map the file instead of reading it
+        A mapped graph reads its edges straight from the file's shared pages without copying and is read-only,
+        otherwise the edges are copied into a new sparse graph
+
+        Returns the loaded DirectedGraph
+        """
+        offsets, targets, weights, whole, _ = read_csr(path, DIRECTED, mmap)
+        return cls._from_csr(offsets, targets, weights, whole, read_only=mmap)
+
+    @contextmanager
+    def batch(self):
+        """
+        Accepts no parameters, for use as 'with graph.batch():' around a group of changes
+        Other threads' changes and snapshots wait until the block ends, so the group is published all at once
+
+        Returns a context manager giving the graph itself
+        """
+        with writing(self):
+            yield self
+
+    def snapshot(self):
+        """
+        Accepts no parameters and takes a read-only copy of the graph between changes rather than during one
+        The copy shares every matrix row or neighbor dict with this graph, along with the reverse index and result
+        cache, and this graph copies a row only before its first change after the snapshot, so taking one costs a copy
+        of the row list and the work after it grows with what changes (array storage copies its buffer in one block)
+        Any number of threads can query the copy without locking while this graph keeps changing. The same copy is
+        handed out until the next change, and while another thread is in the middle of a change the last copy is
+        handed out instead of waiting for it, as long as it holds every change that has finished, so a change is in
+        every snapshot taken after it returns
+
+        Returns a read-only DirectedGraph, this graph itself if it is already read-only
+        """
+        if self._read_only or self.storage == 'csr':
+            return self
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot._version == self._version:
+            return snapshot
+        # a copy missing only changes still being made is as good as one taken just before them
+        if snapshot is not None and snapshot._version >= self._published:
+            if not self._lock.acquire(blocking=False):
+                return snapshot
+        else:
+            self._lock.acquire()
+        try:
+            if self._snapshot is None or self._snapshot._version != self._version:
+                self._snapshot = self._share()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def _share(self):
+        """
+        Accepts no parameters and builds the read-only copy for snapshot(), flagging the rows it shares so the next
+        change to each is made on a copy
+
+        Returns the new read-only DirectedGraph
+        """
+        snapshot = type(self)(storage=self.storage)
+        snapshot.v_count = self.v_count
+        if self.storage == 'array':
+            snapshot.adj_cells = self.adj_cells[:]
+            snapshot._capacity = self._capacity
+        else:
+            if self.storage == 'sparse':
+                snapshot.adj_list = list(self.adj_list)
+                snapshot._sorted = list(self._sorted)
+            else:
+                snapshot.adj_matrix = list(self.adj_matrix)
+            self._shared = bytearray(b'\1') * self.v_count
+        if self._reverse is not None:
+            snapshot._reverse = list(self._reverse)
+            self._shared_reverse = bytearray(b'\1') * len(self._reverse)
+        snapshot._cache = self._cache
+        snapshot._keys = self._keys
+        snapshot._version = self._version
+        snapshot._read_only = True
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        """
+        Accepts no parameters
+
+        Returns the number of changes made to the graph so far
+        """
+        return self._version
+
+    def enable_cache(self, maxsize=128, policy='lru') -> None:
+        """
+        Accepts the most results to keep and the eviction policy ('lru' or 'fifo'), and starts caching dijkstra,
+        has_cycle, get_edges and the numpy edge, degree and weight results until the graph next changes
+
+        No returns
+        """
+        self._cache = ResultCache(maxsize, policy)
+
+    def disable_cache(self) -> None:
+        """
+        Accepts no parameters and stops caching, dropping every cached result
+
+        No returns
+        """
+        self._cache = None
+
+    def cache_info(self) -> dict:
+        """
+        Accepts no parameters
+
+        Returns dict of the cache hit, miss and eviction counters and its size, empty if caching is off
+        """
+        return self._cache.info() if self._cache is not None else {}
+
+    @locked
+    def enable_reverse_index(self) -> None:
+        """
+        Accepts no parameters and builds the in-edges of every vertex now, then keeps them up to date on each change
+        instead of dropping them, so predecessors() and in_degree() never rescan the graph
+
+        No returns
+        """
+        if self._reverse is None:
+            self._build_reverse()
+        self._track_reverse = True
+
+    def disable_reverse_index(self) -> None:
+        """
+        Accepts no parameters and goes back to building the in-edges on demand after each change
+
+        No returns
+        """
+        self._track_reverse = False
+
+    def predecessors(self, v: int) -> []:
+        """
+        Accepts an int representing a vertex
+
+        Returns ascending list of the vertices with an edge to v, empty if v is not in the graph
+        """
+        if v not in range(self.v_count):
+            return []
+        return sorted(src for src, _ in self._reverse_neighbors(v))
+
+    def in_degree(self, v: int) -> int:
+        """
+        Accepts an int representing a vertex
+
+        Returns the number of edges into v, 0 if v is not in the graph
+        """
+        if v not in range(self.v_count):
+            return 0
+        if self._reverse is None:
+            self._build_reverse()
+        return len(self._reverse[v])
+
+    def out_degree(self, v: int) -> int:
+        """
+        Accepts an int representing a vertex
+
+        Returns the number of edges out of v, 0 if v is not in the graph
+        """
+        if v not in range(self.v_count):
+            return 0
+        if self.storage == 'sparse':
+            return len(self.adj_list[v])
+        if self.storage == 'csr':
+            return self.adj_csr[0][v + 1] - self.adj_csr[0][v]
+        return len(self._neighbors(v))
+
     def get_vertices(self) -> []:
         """
         No parameters
@@ -106,6 +778,7 @@ class DirectedGraph:
         """
         return list(range(self.v_count))
 
+    @cached
     def get_edges(self) -> []:
         """
         No parameters
@@ -113,167 +786,700 @@ class DirectedGraph:
         Returns all edges of the graph represented as the src, dst, and weight
         """
         edges = []
-        for outer in range(self.v_count):
-            for inner in range(self.v_count):
-                if self.adj_matrix[outer][inner]:
-                    edges.append((outer, inner, self.adj_matrix[outer][inner]))
+        for src in range(self.v_count):
+            # sorted so both storage modes list edges in the same order
+            for dst, weight in sorted(self._neighbors(src)):
+                edges.append((src, dst, weight))
         return edges
 
+    @cached
+    def edge_arrays(self):
+        """
+        Accepts no parameters and lists the edges as numpy columns, taken with nonzero() straight from the cells in
+        matrix and array storage and from the row offsets in mapped storage, instead of one tuple per edge
+
+        Returns a tuple of (src, dst, weight) numpy arrays in the same order as get_edges()
+        """
+        if np is None:
+            raise ImportError('edge_arrays() requires numpy')
+
+        n = self.v_count
+        if self.storage == 'csr':
+            offsets, targets, weights = (np.asarray(view) for view in self.adj_csr[:3])
+            return np.repeat(np.arange(n), np.diff(offsets)), targets.copy(), weights.copy()
+        if self.storage == 'sparse':
+            offsets, targets, weights = (np.asarray(view) for view in self._to_csr()[:3])
+            return np.repeat(np.arange(n), np.diff(offsets)), targets, weights
+        cells = self._cells()
+        src, dst = cells.nonzero()
+        return src, dst, cells[src, dst]
+
+    @cached
+    def degree_arrays(self):
+        """
+        Accepts no parameters and counts the edges into and out of every vertex with one bincount per column
+
+        Returns a tuple of (in-degrees, out-degrees) numpy arrays of length v_count
+        """
+        src, dst, _ = self.edge_arrays()
+        return np.bincount(dst, minlength=self.v_count), np.bincount(src, minlength=self.v_count)
+
+    def density(self) -> float:
+        """
+        Accepts no parameters
+
+        Returns the fraction of the v_count * (v_count - 1) possible edges that exist, 0.0 with fewer than 2 vertices
+        """
+        n = self.v_count
+        if n < 2:
+            return 0.0
+        return len(self.edge_arrays()[0]) / (n * (n - 1))
+
+    @cached
+    def weight_stats(self) -> dict:
+        """
+        Accepts no parameters
+
+        Returns dict of the edge count and the total, min, max, mean and standard deviation of the edge weights, the
+        statistics None if there are no edges
+        """
+        weights = self.edge_arrays()[2]
+        if not len(weights):
+            return {'count': 0, 'total': 0, 'min': None, 'max': None, 'mean': None, 'std': None}
+        return {'count': len(weights), 'total': weights.sum().item(), 'min': weights.min().item(),
+                'max': weights.max().item(), 'mean': weights.mean().item(), 'std': weights.std().item()}
+
     def is_valid_path(self, path: []) -> bool:
         """
         Accepts a path list
 
         Returns True for a valid path, otherwise False
         """
-        if not path:
-            return True
+        return self._first_invalid(path) == -1
 
-        if len(path) == 1 and path[0] not in range(self.v_count):
-            return False
+    def validate_paths(self, paths):
+        """
+        Accepts an iterable of path lists, or a 2-D numpy int array of equal-length paths (one per row) which is
+        checked a whole column of hops at a time, looking each hop up directly in the rows or cells in matrix and array
+        storage and by binary search over the sorted edges, kept until the graph next changes, otherwise
 
-        for position in range(len(path)):
-            current = self.adj_matrix[path[position]]
-            edges = [i for i in range(len(current)) if current[i]]
-            # check the next position in the path is a vertex and is connected to the current
-            if position + 1 == len(path):
-                break
-            if path[position + 1] not in range(self.v_count) or path[position + 1] not in edges:
-                return False
+        Returns for each path the position of the first vertex that breaks it (not in the graph, or no edge to it from
+        the one before), -1 if the path is valid, as a list or as a numpy array for numpy input
+        """
+        if np is None or not isinstance(paths, np.ndarray):
+            return [self._first_invalid(path) for path in paths]
 
-        return True
+        # empty paths are valid, and in an empty graph every path breaks at its first vertex
+        if not paths.shape[1] or not self.v_count:
+            return np.full(len(paths), 0 if paths.shape[1] else -1)
+        n = self.v_count
+        paths = paths.astype(np.int64)
+        missing = (paths < 0) | (paths >= n)
+        # missing vertices are already flagged, clamping them keeps the lookups below in bounds
+        clamped = np.where(missing, 0, paths)
+        src, dst = clamped[:, :-1], clamped[:, 1:]
+        if self.storage == 'matrix':
+            # one row lookup per hop rather than converting the whole matrix
+            rows = self.adj_matrix
+            linked = np.fromiter((rows[s][d] != 0 for s, d in zip(src.ravel().tolist(), dst.ravel().tolist())),
+                                 dtype=bool, count=src.size).reshape(src.shape)
+        elif self.storage == 'array':
+            linked = self._cells()[src, dst] != 0
+        else:
+            keys = self._edge_keys()
+            hops = src * n + dst
+            found = np.searchsorted(keys, hops)
+            linked = keys[np.minimum(found, len(keys) - 1)] == hops if len(keys) else np.zeros(hops.shape, bool)
+        broken = missing
+        broken[:, 1:] |= ~linked
+        return np.where(broken.any(axis=1), broken.argmax(axis=1), -1)
 
-    def dfs(self, v_start, v_end=None) -> []:
+    def iter_dfs(self, v_start, max_depth=None, details=False, ordered=True):
         """
-        Accepts a start and optional end vertex to perform a dfs on
+        Accepts a start vertex, an optional depth limit, details=True to also get each vertex's depth and parent, and
+        ordered=False to follow neighbors in storage order when the visit order does not matter
+        Vertices come out lazily in the same order dfs() visits them, so the caller can stop at any point without
+        paying for the rest of the search
+        With max_depth, depth means the fewest hops found so far rather than depth in the search tree: a vertex first
+        reached the long way round is expanded again when a shorter path reaches it, so every vertex within max_depth
+        hops comes out (once, with the depth and parent it was first reached with)
 
-        Return list of vertices visited during DFS search
-        Vertices are picked in alphabetical order
+        Returns a generator of vertices, or of (vertex, depth, parent) tuples with details (parent None for v_start)
         """
-        visited = []
         if v_start not in range(self.v_count):
-            return visited
+            return
+        seen = bytearray(self.v_count)
+        limited = max_depth is not None
+        # fewest hops each vertex has been expanded at, only needed with a depth limit
+        best = [max_depth + 1] * self.v_count if limited else None
         # "stack" operations for a list will be pop and append
-        # using a list to find the next *smallest vertex to follow
-        stack = []
-        stack.append(v_start)
+        # each entry also carries the depth and parent it was reached with
+        stack = [(v_start, 0, None)]
 
         while len(stack):
-            cur = stack.pop()
-            if cur not in visited:
-                visited.append(cur)
-                if cur == v_end:
-                    # the path when we found the end
-                    return visited
-                next_level = []
-                for neighbor_pos in range(len(self.adj_matrix[cur])):
-                    if self.adj_matrix[cur][neighbor_pos] and neighbor_pos not in visited:
-                        next_level.append(neighbor_pos)
-                next_level.sort()
-                # move "lowest" lexicographically sorted values to the top of the stack
-                stack += next_level[::-1]
-        return visited
+            cur, depth, parent = stack.pop()
+            if seen[cur]:
+                if not limited or depth >= best[cur]:
+                    continue
+            else:
+                seen[cur] = 1
+                yield (cur, depth, parent) if details else cur
+            if limited:
+                best[cur] = depth
+                if depth == max_depth:
+                    continue
+            # push in reverse so the "lowest" sorted values end up on the top of the stack
+            for neighbor_pos in reversed(self._targets(cur, ordered)):
+                if not seen[neighbor_pos] or (limited and depth + 1 < best[neighbor_pos]):
+                    stack.append((neighbor_pos, depth + 1, cur))
 
-    def bfs(self, v_start, v_end=None) -> []:
+    def iter_bfs(self, v_start, max_depth=None, details=False, ordered=True):
         """
-        Accepts a start and optional end vertex to perform a dfs on
+        Accepts a start vertex, an optional depth limit, details=True to also get each vertex's hop distance and
+        parent, and ordered=False to follow neighbors in storage order when the visit order does not matter
+        Vertices come out lazily in the same order bfs() visits them, so the caller can stop at any point without
+        paying for the rest of the search
+
+        Returns a generator of vertices, or of (vertex, hops, parent) tuples with details (parent None for v_start)
+        """
+        if v_start not in range(self.v_count):
+            return
+        # vertices are marked seen when queued so each one enters the queue once
+        seen = bytearray(self.v_count)
+        seen[v_start] = 1
+        queue = deque([(v_start, None)])
+        hops = 0
+
+        while queue:
+            # everything queued right now is on the same level
+            for _ in range(len(queue)):
+                cur, parent = queue.popleft()
+                yield (cur, hops, parent) if details else cur
+                if hops == max_depth:
+                    continue
+                # "lowest" sorted values leave the queue first
+                for neighbor_pos in self._targets(cur, ordered):
+                    if not seen[neighbor_pos]:
+                        seen[neighbor_pos] = 1
+                        queue.append((neighbor_pos, cur))
+            hops += 1
+
+    def dfs(self, v_start, v_end=None, ordered=True) -> []:
+        """
+        Accepts a start and optional end vertex to perform a dfs on, ordered=False to skip the visit order guarantee
 
         Return list of vertices visited during DFS search
         Vertices are picked in alphabetical order
         """
         visited = []
-        if v_start not in range(self.v_count):
-            return visited
-        # "stack" operations for a list will be pop and insert[0]
-        # using a list to find the next *smallest vertex to follow
-        stack = []
-        stack.append(v_start)
-
-        while len(stack):
-            cur = stack.pop()
-            if cur not in visited:
-                visited.append(cur)
-                if cur == v_end:
-                    # the path when we found the end
-                    return visited
-                next_level = []
-                for neighbor_pos in range(len(self.adj_matrix[cur])):
-                    if self.adj_matrix[cur][neighbor_pos] and neighbor_pos not in visited:
-                        next_level.append(neighbor_pos)
-                next_level.sort()
-                # move "lowest" lexicographically sorted values to the top of the stack
-                stack = next_level[::-1] + stack
+        for cur in self.iter_dfs(v_start, ordered=ordered):
+            visited.append(cur)
+            if cur == v_end:
+                # the path when we found the end
+                break
         return visited
 
-    def has_cycle(self):
+    def bfs(self, v_start, v_end=None, levels=False, ordered=True):
+        """
+        Accepts a start and optional end vertex to perform a bfs on, levels=True to also get hop distances, and
+        ordered=False to skip the visit order guarantee
+
+        Return list of vertices visited during BFS search, or when levels is True a dict of each visited vertex
+        to its hop distance from v_start (in visit order)
+        Vertices are picked in alphabetical order
+        """
+        visited = {}
+        for cur, hops, _ in self.iter_bfs(v_start, details=True, ordered=ordered):
+            visited[cur] = hops
+            if cur == v_end:
+                # the path when we found the end
+                break
+        return visited if levels else list(visited)
+
+    @cached
+    def has_cycle(self, return_cycle=False):
         """
-        Accepts no parameters and checks for any loops within the graph
+        Accepts an optional return_cycle flag and checks for any loops within the graph in a single dfs pass
 
         Returns True if a loop is present, otherwise False
+        When return_cycle is True returns the vertices of one loop in edge order instead, empty list if there is none
         """
-        visited = []
+        # 0 is unseen, 1 is on the current dfs path, 2 is fully explored
+        color = bytearray(self.v_count)
+
+        for vertex_pos in range(self.v_count):
+            if color[vertex_pos]:
+                continue
+            color[vertex_pos] = 1
+            # the stack is the current dfs path, each vertex paired with its remaining neighbors
+            stack = [(vertex_pos, iter(self._neighbors(vertex_pos)))]
+
+            while len(stack):
+                cur, neighbors = stack[-1]
+                for neighbor_pos, _ in neighbors:
+                    if color[neighbor_pos] == 1:
+                        # an edge back to a vertex still on the path closes a loop
+                        if not return_cycle:
+                            return True
+                        path = [vertex for vertex, _ in stack]
+                        return path[path.index(neighbor_pos):]
+                    if not color[neighbor_pos]:
+                        color[neighbor_pos] = 1
+                        stack.append((neighbor_pos, iter(self._neighbors(neighbor_pos))))
+                        break
+                else:
+                    # every neighbor explored, nothing reachable from cur loops back to it
+                    color[cur] = 2
+                    stack.pop()
+
+        return [] if return_cycle else False
+
+    def _in_degrees(self) -> []:
+        """
+        Accepts no parameters and counts the incoming edges of every vertex in one pass over the edges
+
+        Returns list of v_count in-degrees
+        """
+        in_degree = [0] * self.v_count
+        for src in range(self.v_count):
+            for dst in self._targets(src, ordered=False):
+                in_degree[dst] += 1
+        return in_degree
+
+    def _acyclic_order(self, smallest_first=False) -> []:
+        """
+        Accepts whether ties should go to the smallest vertex and orders the vertices with kahns algorithm
+
+        Returns list of all vertices with every edge going forward, raises ValueError naming a loop if there is one
+        """
+        in_degree = self._in_degrees()
+        ready = [v for v in range(self.v_count) if not in_degree[v]]
+        # a heap always hands out the smallest ready vertex, a plain queue whichever became ready first
+        if smallest_first:
+            heapq.heapify(ready)
+            pop = lambda: heapq.heappop(ready)
+            push = lambda v: heapq.heappush(ready, v)
+        else:
+            ready = deque(ready)
+            pop, push = ready.popleft, ready.append
+
+        order = []
+        while ready:
+            cur = pop()
+            order.append(cur)
+            for dst in self._targets(cur, ordered=False):
+                in_degree[dst] -= 1
+                if not in_degree[dst]:
+                    push(dst)
+
+        if len(order) < self.v_count:
+            raise ValueError(f'graph has a cycle: {self.has_cycle(return_cycle=True)}')
+        return order
+
+    def topological_sort(self, smallest_first=False) -> []:
+        """
+        Accepts an optional smallest_first flag to make the order deterministic, always taking the smallest vertex
+        whose dependencies are done (O((V+E) log V) instead of O(V+E))
+
+        Returns list of all vertices where every edge goes from an earlier to a later vertex
+        Raises ValueError naming the vertices of a loop if the graph has one
+        """
+        return self._acyclic_order(smallest_first)
+
+    def topological_levels(self) -> []:
+        """
+        Accepts no parameters and groups the vertices into waves, each vertex placed in the first wave after all the
+        vertices with edges into it, so everything in one wave can run at the same time
+
+        Returns list of waves, each a sorted list of vertices
+        Raises ValueError naming the vertices of a loop if the graph has one
+        """
+        in_degree = self._in_degrees()
+        wave = [v for v in range(self.v_count) if not in_degree[v]]
+        levels = []
+        placed = 0
+        while wave:
+            levels.append(wave)
+            placed += len(wave)
+            next_wave = []
+            for cur in wave:
+                for dst in self._targets(cur, ordered=False):
+                    in_degree[dst] -= 1
+                    if not in_degree[dst]:
+                        next_wave.append(dst)
+            next_wave.sort()
+            wave = next_wave
+
+        if placed < self.v_count:
+            raise ValueError(f'graph has a cycle: {self.has_cycle(return_cycle=True)}')
+        return levels
+
+    def dag_shortest_paths(self, src: int) -> []:
+        """
+        Accepts an int as the start vertex and relaxes every edge once in topological order, which only works for
+        graphs without loops but skips the heap work of dijkstra
+
+        Returns a list of "distances" (sum of weights), inf if not possible
+        Raises ValueError naming the vertices of a loop if the graph has one
+        """
+        distances = [float('inf')] * self.v_count
+        if src not in range(self.v_count):
+            return distances
+        distances[src] = 0
+        for cur in self._acyclic_order():
+            if distances[cur] == float('inf'):
+                continue
+            for dst, weight in self._neighbors(cur):
+                if distances[cur] + weight < distances[dst]:
+                    distances[dst] = distances[cur] + weight
+        return distances
+
+    def critical_path(self):
+        """
+        Accepts no parameters and finds the longest weighted path anywhere in the graph by relaxing every edge once in
+        topological order, e.g. the chain of jobs that decides how long a whole schedule takes
+
+        Returns a tuple of (length, path), (0, []) for an empty graph
+        Raises ValueError naming the vertices of a loop if the graph has one
+        """
+        if not self.v_count:
+            return 0, []
+        # longest path ending at each vertex, any vertex can start one
+        longest = [0] * self.v_count
+        via = [None] * self.v_count
+        for cur in self._acyclic_order():
+            for dst, weight in self._neighbors(cur):
+                if longest[cur] + weight > longest[dst]:
+                    longest[dst] = longest[cur] + weight
+                    via[dst] = cur
+
+        end = max(range(self.v_count), key=longest.__getitem__)
+        path = [end]
+        while via[path[-1]] is not None:
+            path.append(via[path[-1]])
+        return longest[end], path[::-1]
+
+    def strongly_connected_components(self) -> []:
+        """
+        Accepts no parameters and finds the strongly connected components with tarjans algorithm in O(V+E), run with
+        an explicit stack so deep graphs never hit the recursion limit
+
+        Returns list of components, each a sorted list of vertices, ordered so every edge between two components goes
+        from an earlier one to a later one
+        """
+        # dfs discovery number of each vertex, and the lowest one reachable from its subtree through unfinished vertices
+        index = [-1] * self.v_count
+        low = [0] * self.v_count
+        on_stack = bytearray(self.v_count)
         stack = []
+        components = []
+        counter = 0
 
         for vertex_pos in range(self.v_count):
+            if index[vertex_pos] != -1:
+                continue
+            index[vertex_pos] = low[vertex_pos] = counter
+            counter += 1
             stack.append(vertex_pos)
+            on_stack[vertex_pos] = 1
+            # the dfs path, each vertex paired with its remaining neighbors
+            path = [(vertex_pos, iter(self._targets(vertex_pos, ordered=False)))]
 
-            while len(stack):
-                cur = stack.pop()
-                if cur not in visited:
-                    visited.append(cur)
+            while path:
+                cur, neighbors = path[-1]
+                for neighbor_pos in neighbors:
+                    if index[neighbor_pos] == -1:
+                        index[neighbor_pos] = low[neighbor_pos] = counter
+                        counter += 1
+                        stack.append(neighbor_pos)
+                        on_stack[neighbor_pos] = 1
+                        path.append((neighbor_pos, iter(self._targets(neighbor_pos, ordered=False))))
+                        break
+                    if on_stack[neighbor_pos] and index[neighbor_pos] < low[cur]:
+                        low[cur] = index[neighbor_pos]
+                else:
+                    path.pop()
+                    if path and low[cur] < low[path[-1][0]]:
+                        low[path[-1][0]] = low[cur]
+                    if low[cur] == index[cur]:
+                        # cur is the first vertex of its component, which is everything above it on the stack
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = 0
+                            component.append(member)
+                            if member == cur:
+                                break
+                        components.append(sorted(component))
+
+        # tarjan completes a component only after every component it leads to
+        components.reverse()
+        return components
 
-                    next_level = []
-                    for neighbor_pos in range(len(self.adj_matrix[cur])):
-                        if self.adj_matrix[cur][neighbor_pos]:
-                            next_level.append(neighbor_pos)
-                    next_level.sort()
-                    # move "lowest" lexicographically sorted values to the top of the stack
-                    stack += next_level[::-1]
+    def condensation(self):
+        """
+        Accepts no parameters and collapses every strongly connected component into one vertex, keeping the lightest
+        edge between each pair of components
 
-                if cur in stack:
-                    return True
+        Returns a new DirectedGraph with no loops, where vertex i stands for component i of
+        strongly_connected_components()
+        """
+        components = self.strongly_connected_components()
+        component_of = [0] * self.v_count
+        for pos, component in enumerate(components):
+            for vertex in component:
+                component_of[vertex] = pos
 
-            visited = []
-            stack = []
+        lightest = {}
+        for src in range(self.v_count):
+            for dst, weight in self._neighbors(src):
+                key = (component_of[src], component_of[dst])
+                if key[0] != key[1] and (key not in lightest or weight < lightest[key]):
+                    lightest[key] = weight
 
-        return False
+        storage = 'sparse' if self.storage == 'csr' else self.storage
+        edges = [(src, dst, weight) for (src, dst), weight in lightest.items()]
+        return DirectedGraph.from_edges(edges, storage=storage, v_count=len(components))
 
-    def dijkstra(self, src: int) -> []:
+    @cached
+    def dijkstra(self, src: int, dst=None, max_distance=None, predecessors=False):
         """
         Accepts an int as the start vertex and uses dijkstras algorithm to determine distances to all nodes, inf if not
         possible
+        Optionally accepts a dst vertex to stop as soon as its distance is final, a max_distance past which vertices
+        count as unreachable, and predecessors=True to also get the previous vertex on each shortest path
 
-        Returns a list of "distances" (sum of weights)
+        Returns a list of "distances" (sum of weights), or a tuple of (distances, previous vertices) with predecessors
+        When stopped early at dst only the vertices settled before it have a distance, the rest are inf
         """
-        visited = {}
-        pr_heap = []
-        heapq.heappush(pr_heap, (0, src))
+        distances = [float('inf')] * self.v_count
+        previous = [None] * self.v_count
+        if src not in range(self.v_count):
+            return (distances, previous) if predecessors else distances
+
+        # best known distance and the vertex it came from, only improvements are pushed on the heap
+        best = [float('inf')] * self.v_count
+        via = [None] * self.v_count
+        best[src] = 0
+        pr_heap = [(0, src)]
+        while pr_heap:
+            cur_dis, cur_vert = heapq.heappop(pr_heap)
+            if cur_dis > best[cur_vert]:
+                # stale entry, cur_vert was already settled with a shorter distance
+                continue
+            distances[cur_vert] = cur_dis
+            previous[cur_vert] = via[cur_vert]
+            if cur_vert == dst:
+                break
+            for neighbor_pos, weight in self._neighbors(cur_vert):
+                # current distance and next to determine overall shortest
+                next_dis = cur_dis + weight
+                if next_dis >= best[neighbor_pos]:
+                    continue
+                if max_distance is not None and next_dis > max_distance:
+                    continue
+                best[neighbor_pos] = next_dis
+                via[neighbor_pos] = cur_vert
+                heapq.heappush(pr_heap, (next_dis, neighbor_pos))
+
+        return (distances, previous) if predecessors else distances
+
+    def shortest_path(self, src: int, dst: int) -> []:
+        """
+        Accepts a start and end vertex and runs dijkstra until the end vertex is settled
+
+        Returns list of vertices on a shortest path from src to dst, empty if dst cannot be reached
+        """
+        if dst not in range(self.v_count):
+            return []
+        distances, previous = self.dijkstra(src, dst, predecessors=True)
+        if distances[dst] == float('inf'):
+            return []
+        path = [dst]
+        while path[-1] != src:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+    def bidirectional_dijkstra(self, src: int, dst: int):
+        """
+        Accepts a start and end vertex and runs dijkstra forward from src and backward from dst over the in-edges,
+        always growing the side with the closer frontier, until the two searches can no longer improve the best meeting
+
+        Returns a tuple of (distance, path, number of vertices settled), inf and an empty path if dst cannot be reached
+        """
+        if src not in range(self.v_count) or dst not in range(self.v_count):
+            return float('inf'), [], 0
+
+        # index 0 is the forward search from src, index 1 the backward search from dst
+        best = [{src: 0}, {dst: 0}]
+        via = [{src: None}, {dst: None}]
+        done = [set(), set()]
+        heaps = [[(0, src)], [(0, dst)]]
+        expand = [self._neighbors, self._reverse_neighbors]
+        shortest = 0 if src == dst else float('inf')
+        meet = src if src == dst else None
+        settled = 0
+
+        while heaps[0] and heaps[1]:
+            # no path through either frontier can beat the best meeting found so far
+            if heaps[0][0][0] + heaps[1][0][0] >= shortest:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            cur_dis, cur_vert = heapq.heappop(heaps[side])
+            if cur_vert in done[side]:
+                continue
+            done[side].add(cur_vert)
+            settled += 1
+            other = best[1 - side]
+            for neighbor_pos, weight in expand[side](cur_vert):
+                next_dis = cur_dis + weight
+                if next_dis < best[side].get(neighbor_pos, float('inf')):
+                    best[side][neighbor_pos] = next_dis
+                    via[side][neighbor_pos] = cur_vert
+                    heapq.heappush(heaps[side], (next_dis, neighbor_pos))
+                if neighbor_pos in other and best[side][neighbor_pos] + other[neighbor_pos] < shortest:
+                    shortest = best[side][neighbor_pos] + other[neighbor_pos]
+                    meet = neighbor_pos
+
+        if meet is None:
+            return float('inf'), [], settled
+        # walk back to src from the meeting vertex, then forward to dst
+        path = [meet]
+        while via[0][path[-1]] is not None:
+            path.append(via[0][path[-1]])
+        path.reverse()
+        while via[1][path[-1]] is not None:
+            path.append(via[1][path[-1]])
+        return shortest, path, settled
+
+    def dijkstra_many(self, sources, workers=None, chunk_size=None):
+        """
+        Accepts an iterable of start vertices and runs dijkstra for each across a pool of worker processes, optionally
+        with the number of workers (default all cores) and how many sources each task handles
+        The graph is packed into compressed arrays and sent once to each worker, not once per task
+
+        Returns a generator of (src, distances) tuples in the order they finish
+        """
+        sources = list(sources)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(sources) <= 1:
+            for src in sources:
+                yield src, self.dijkstra(src)
+            return
+
+        if chunk_size is None:
+            # a few chunks per worker keeps them busy when some sources take longer than others
+            chunk_size = max(1, -(-len(sources) // (workers * 4)))
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_dijkstra_worker, initargs=self._to_csr())
+        try:
+            tasks = [pool.submit(_run_dijkstra_chunk, sources[start:start + chunk_size])
+                     for start in range(0, len(sources), chunk_size)]
+            for task in as_completed(tasks):
+                yield from task.result()
+        finally:
+            # the caller may stop early, drop whatever has not started
+            pool.shutdown(cancel_futures=True)
+
+    def a_star(self, src: int, dst: int, heuristic):
+        """
+        Accepts a start and end vertex and a heuristic function of a vertex that never overestimates its remaining
+        distance to dst, and searches outward from src in order of distance so far plus the heuristic
+
+        Returns a tuple of (distance, path, number of vertices settled), inf and an empty path if dst cannot be reached
+        """
+        if src not in range(self.v_count) or dst not in range(self.v_count):
+            return float('inf'), [], 0
+
+        best = {src: 0}
+        via = {src: None}
+        pr_heap = [(heuristic(src), 0, src)]
+        settled = 0
+
         while pr_heap:
-            cur = heapq.heappop(pr_heap)
-            cur_vert = cur[1]
-            cur_dis = cur[0]
-            if cur_vert not in visited:
-                visited[cur_vert] = cur_dis
-                # all neighbors
-                for neighbor_pos in range(len(self.adj_matrix[cur_vert])):
-                    if self.adj_matrix[cur_vert][neighbor_pos]:
-                        # current distance and next to determine overall shortest
-                        heapq.heappush(pr_heap, (self.adj_matrix[cur_vert][neighbor_pos] + cur_dis, neighbor_pos))
-
-        # any indexes to the range of v_count not in visited are unreachable, place into index order in list
-        distances = []
-        for ind in range(self.v_count):
-            if ind in visited:
-                distances.append(visited[ind])
+            _, cur_dis, cur_vert = heapq.heappop(pr_heap)
+            if cur_dis > best[cur_vert]:
+                # stale entry, a shorter way to cur_vert was found after it was pushed
+                continue
+            settled += 1
+            if cur_vert == dst:
+                path = [dst]
+                while via[path[-1]] is not None:
+                    path.append(via[path[-1]])
+                return cur_dis, path[::-1], settled
+            for neighbor_pos, weight in self._neighbors(cur_vert):
+                next_dis = cur_dis + weight
+                if next_dis < best.get(neighbor_pos, float('inf')):
+                    best[neighbor_pos] = next_dis
+                    via[neighbor_pos] = cur_vert
+                    heapq.heappush(pr_heap, (next_dis + heuristic(neighbor_pos), next_dis, neighbor_pos))
+
+        return float('inf'), [], settled
+
+    def all_pairs_shortest_paths(self, next_hop=False):
+        """
+        Accepts an optional next_hop flag and runs floyd-warshall on the weight matrix as a numpy array, relaxing every
+        pair through one intermediate vertex per step with a single broadcast
+
+        Returns a v_count x v_count numpy array of distances (inf if not possible), or with next_hop a tuple of that and
+        a matching int array of the first vertex to move to on each shortest path (-1 if none)
+        """
+        if np is None:
+            raise ImportError('all_pairs_shortest_paths() requires numpy')
+
+        n = self.v_count
+        if self.storage in ('matrix', 'array'):
+            dist = self._cells().astype(float)
+        else:
+            dist = np.zeros((n, n))
+            for src in range(n):
+                for dst, weight in self._neighbors(src):
+                    dist[src, dst] = weight
+        # an empty cell means no edge, and every vertex is 0 away from itself
+        dist[dist == 0] = np.inf
+        np.fill_diagonal(dist, 0)
+        if next_hop:
+            hops = np.where(np.isfinite(dist), np.arange(n), -1)
+
+        for k in range(n):
+            through = dist[:, k, None] + dist[k, None, :]
+            if next_hop:
+                shorter = through < dist
+                dist = np.where(shorter, through, dist)
+                # going through k starts with the same hop as going to k
+                hops = np.where(shorter, hops[:, k, None], hops)
             else:
-                distances.append(float('inf'))
+                np.minimum(dist, through, out=dist)
 
-        return distances
+        return (dist, hops) if next_hop else dist
 
 
+# the graph each dijkstra_many() worker process searches, set once when the process starts
+_worker_graph = None
+
+
+def _init_dijkstra_worker(offsets, targets, weights, whole):
+    """
+    Accepts the compressed sparse row arrays and int flags of a graph and rebuilds it for this worker process
+
+    No returns
+    """
+    global _worker_graph
+    _worker_graph = DirectedGraph._from_csr(offsets, targets, weights, whole)
+
+
+def _run_dijkstra_chunk(sources):
+    """
+    Accepts a list of start vertices and runs dijkstra for each on this worker's graph
+
+    Returns list of (src, distances) tuples
+    """
+    return [(src, _worker_graph.dijkstra(src)) for src in sources]
 
 
 if __name__ == '__main__':
 
+    from itertools import islice
+
     print("\nPDF - method add_vertex() / add_edge example 1")
     print("----------------------------------------------")
     g = DirectedGraph()
@@ -334,6 +1540,7 @@ if __name__ == '__main__':
         g.add_edge(src, dst)
         print(g.get_edges(), g.has_cycle(), sep='\n')
     print('\n', g)
+    print('cycle:', g.has_cycle(return_cycle=True))
 
 
     print("\nPDF - dijkstra() example 1")
@@ -347,3 +1554,214 @@ if __name__ == '__main__':
     print('\n', g)
     for i in range(5):
         print(f'DIJKSTRA {i} {g.dijkstra(i)}')
+
+
+    print("\nsparse storage - dfs(), bfs() and dijkstra() example")
+    print("----------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges, storage='sparse')
+    print(g.get_edges())
+    for start in range(5):
+        print(f'{start} DFS:{g.dfs(start)} BFS:{g.bfs(start)} DIJKSTRA:{g.dijkstra(start)}')
+
+
+    print("\narray storage - add_vertex() / add_edge() example")
+    print("-------------------------------------------------")
+    g = DirectedGraph(storage='array')
+    for _ in range(5):
+        g.add_vertex()
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    for src, dst, weight in edges:
+        g.add_edge(src, dst, weight)
+    print(g)
+    print(f'capacity {g._capacity}, {len(g.adj_cells) * g.adj_cells.itemsize} bytes')
+
+
+    print("\nmethod bfs() with levels example")
+    print("-------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for start in range(5):
+        print(f'{start} BFS LEVELS:{g.bfs(start, levels=True)}')
+
+
+    print("\nmethod dijkstra() early exit / shortest_path() example")
+    print("-----------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    print(f'DIJKSTRA 0 dst=3 {g.dijkstra(0, dst=3)}')
+    print(f'DIJKSTRA 0 max_distance=26 {g.dijkstra(0, max_distance=26)}')
+    print(f'DIJKSTRA 0 predecessors {g.dijkstra(0, predecessors=True)}')
+    for src, dst in [(0, 2), (2, 3), (3, 0), (1, 1)]:
+        print(f'{src}-{dst} PATH:{g.shortest_path(src, dst)}')
+
+
+    print("\nmethod bidirectional_dijkstra() / a_star() example")
+    print("-------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges, storage='sparse')
+    for src, dst in [(0, 2), (2, 3), (3, 0), (1, 1)]:
+        print(f'{src}-{dst} BIDIRECTIONAL:{g.bidirectional_dijkstra(src, dst)} '
+              f'A*:{g.a_star(src, dst, lambda v: 0)}')
+
+
+    print("\nmethod all_pairs_shortest_paths() example")
+    print("----------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    if np is None:
+        print('numpy is not installed')
+    else:
+        dist, hops = g.all_pairs_shortest_paths(next_hop=True)
+        print(dist, hops, sep='\n')
+
+
+    print("\nmethod dijkstra_many() example")
+    print("------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    for src, distances in sorted(g.dijkstra_many(range(5), workers=2)):
+        print(f'DIJKSTRA {src} {distances}')
+
+
+    print("\nmethod from_edges() example")
+    print("---------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7), (2, 2, 1), (5, 6)]
+    g = DirectedGraph.from_edges(edges, storage='sparse', v_count=8)
+    print(g.get_vertices(), g.get_edges(), sep='\n')
+    if np is not None:
+        g = DirectedGraph.from_edges(np.array(edges[:7]), storage='array')
+        print(g.get_edges())
+
+
+    print("\nmethod save() / load() example")
+    print("------------------------------")
+    import tempfile
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    with tempfile.TemporaryDirectory() as tmp:
+        DirectedGraph(edges).save(f'{tmp}/graph.bin')
+        g = DirectedGraph.load(f'{tmp}/graph.bin')
+        print(g.storage, g.get_edges(), g.dijkstra(0), g.is_valid_path([0, 1, 4, 3]))
+        try:
+            g.add_edge(0, 2)
+        except TypeError as error:
+            print(error)
+        del g
+
+
+    print("\nmethod from_edge_file() example")
+    print("-------------------------------")
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(f'{tmp}/edges.csv', 'w') as f:
+            f.write('# src,dst,weight\n0,1,10\n4,0,12\n1,4,15\n4,3,3\n3,1,5\n2,1,23\n3,2,7\n')
+        g = DirectedGraph.from_edge_file(f'{tmp}/edges.csv', storage='sparse', batch_size=3,
+                                         progress=lambda bytes_read, edges_read: print('progress', edges_read))
+    print(g.get_edges())
+
+
+    print("\nmethod iter_dfs() / iter_bfs() example")
+    print("--------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    print('first 3 DFS from 0:', list(islice(g.iter_dfs(0), 3)))
+    print('BFS from 4 within 1 hop:', list(g.iter_bfs(4, max_depth=1, details=True)))
+    print('first even vertex by DFS from 1:', next(v for v in g.iter_dfs(1) if v % 2 == 0))
+
+
+    print("\nmethod topological_sort() / topological_levels() / critical_path() example")
+    print("-------------------------------------------------------------------------")
+    edges = [(0, 2, 3), (1, 2, 2), (2, 3, 4), (2, 4, 1), (3, 5, 2), (4, 5, 6), (1, 4, 9)]
+    g = DirectedGraph(edges)
+    print(g.topological_sort(), g.topological_sort(smallest_first=True))
+    print(g.topological_levels())
+    print(g.dag_shortest_paths(1), g.dijkstra(1))
+    print(g.critical_path())
+    g.add_edge(5, 1)
+    try:
+        g.topological_sort()
+    except ValueError as error:
+        print(error)
+
+
+    print("\nmethod strongly_connected_components() / condensation() example")
+    print("---------------------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7), (5, 6, 1), (6, 5, 2), (2, 5, 4), (7, 2, 8)]
+    g = DirectedGraph(edges)
+    print(g.strongly_connected_components())
+    print(g.condensation().get_edges())
+
+
+    print("\nmethod enable_cache() / cache_info() example")
+    print("--------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges, storage='sparse')
+    g.enable_cache(maxsize=4)
+    for src in [0, 1, 0, 1, 2, 3, 4, 0]:
+        g.dijkstra(src)
+    print(g.cache_info())
+    g.remove_edge(4, 3)
+    print(g.version, g.dijkstra(0), g.cache_info())
+
+
+    print("\nmethod predecessors() / in_degree() / out_degree() example")
+    print("----------------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges, storage='sparse', reverse_index=True)
+    print([g.predecessors(i) for i in range(5)])
+    g.remove_edge(2, 1)
+    g.add_edge(0, 3, 4)
+    print([(g.in_degree(i), g.out_degree(i)) for i in range(5)], g.predecessors(1), g.predecessors(3))
+
+
+    print("\nmethod edge_arrays() / degree_arrays() / density() / weight_stats() example")
+    print("-------------------------------------------------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    if np is None:
+        print('numpy is not installed')
+    else:
+        for storage in ('matrix', 'sparse', 'array'):
+            g = DirectedGraph(edges, storage=storage)
+            print(*g.edge_arrays(), *g.degree_arrays(), round(g.density(), 2))
+        print(g.weight_stats())
+
+
+    print("\nmethod validate_paths() example")
+    print("------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    paths = [[], [1], [9], [0, 1, 4, 3], [4, 3, 2, 1, 4], [0, 4], [3, 2, 1, 9]]
+    for storage in ('matrix', 'sparse'):
+        g = DirectedGraph(edges, storage=storage)
+        print(g.validate_paths(paths))
+        if np is not None:
+            print(g.validate_paths(np.array([[0, 1, 4, 3], [4, 3, 2, 1], [2, 1, 0, 4], [3, 1, 4, 7]])))
+
+
+    print("\nmethod batch() / snapshot() example")
+    print("----------------------------------")
+    edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+             (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+    g = DirectedGraph(edges)
+    snap = g.snapshot()
+    with g.batch():
+        g.remove_edge(4, 3)
+        g.add_edge(4, 2, 1)
+    print(snap.dijkstra(4), g.snapshot().dijkstra(4), snap is g.snapshot(), g.snapshot() is g.snapshot())
+    try:
+        snap.add_edge(0, 2)
+    except TypeError as error:
+        print(error)
@@ -0,0 +1,124 @@
+# Course: CS261 - Data Structures
+# Author: Tristan Howell
+# Assignment: Assignment 6: Graph Data Structures
+# Description: Cache query results of a graph until the graph next changes
+
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+
+class ResultCache:
+    """
+    Class to implement a bounded cache of query results
+    - 'lru' policy evicts the entry used longest ago
+    - 'fifo' policy evicts the entry stored longest ago
+    - safe to share between threads, e.g. a graph and its snapshots
+    """
+
+    def __init__(self, maxsize=128, policy='lru'):
+        """
+        Store entries in an ordered dict, oldest first
+        """
+        if policy not in ('lru', 'fifo'):
+            raise ValueError(f"unknown policy '{policy}', expected 'lru' or 'fifo'")
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Accepts a key and looks it up, counting the hit or miss
+
+        Returns a tuple of (found, value), value None when not found
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            if self.policy == 'lru':
+                self._entries.move_to_end(key)
+            return True, self._entries[key]
+
+    def put(self, key, value) -> None:
+        """
+        Accepts a key and value to store, evicting the oldest entry if the cache is full
+
+        No returns
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Accepts no parameters and drops every entry, keeping the counters
+
+        No returns
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> dict:
+        """
+        Accepts no parameters
+
+        Returns dict of the hit, miss and eviction counters along with the current and maximum size
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+def _copy(value):
+    """
+    Accepts a cached result and copies the lists, dicts and arrays in it, so a caller changing what it got back cannot
+    change the cache
+
+    Returns the copy
+    """
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    # numpy arrays
+    if hasattr(value, 'copy'):
+        return value.copy()
+    return value
+
+
+def cached(method):
+    """
+    Accepts a graph query method and wraps it to answer from the graph's _cache when it has one
+    Results are keyed on the method name, its arguments and the graph's _version, so any change to the graph makes
+    the old entries unreachable and they age out of the cache
+
+    Returns the wrapped method
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._cache is None:
+            return method(self, *args, **kwargs)
+        key = (method.__name__, args, tuple(sorted(kwargs.items())), self._version)
+        try:
+            found, value = self._cache.get(key)
+        except TypeError:
+            # unhashable arguments cannot be cached
+            return method(self, *args, **kwargs)
+        if not found:
+            value = method(self, *args, **kwargs)
+            self._cache.put(key, value)
+        return _copy(value)
+    return wrapper
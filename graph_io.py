@@ -0,0 +1,198 @@
+# Course: CS261 - Data Structures
+# Author: Tristan Howell
+# Assignment: Assignment 6: Graph Data Structures
+# Description: Read and write graphs as a versioned binary compressed sparse row file, and stream text edge lists
+
+import gzip
+import mmap as mmap_module
+import os
+import secrets
+import struct
+from array import array
+
+# magic, format version, kind, vertex count, edge count, weight typecode ('m' for float64 weights with int flags)
+HEADER = struct.Struct('<8sIIQQc7x')
+MAGIC = b'GRAPHCSR'
+VERSION = 1
+DIRECTED = 0
+UNDIRECTED = 1
+
+
+def write_csr(path, kind: int, offsets, targets, weights=None, whole=None, labels=None) -> None:
+    """
+    Accepts a file path, the graph kind, compressed sparse row arrays of int64 offsets and targets, optional int64 or
+    float64 weights, for float64 weights optional bytes flagging the edges whose weight is an int, and optional str
+    vertex labels
+
+    Every section after the 40 byte header is a run of 8 byte little-endian values so it can be mapped back in place:
+    offsets (v_count + 1), targets (e_count), weights (e_count, if any), the int flags (one byte per edge, padded to a
+    multiple of 8 bytes, if any), then for labels their byte offsets (v_count + 1) followed by the utf-8 text of all
+    labels
+    The file is written next to path under a temporary name and then renamed over it, so processes that have the old
+    file mapped keep reading the old file instead of one truncated under them
+
+    No returns
+    """
+    typecode = weights.typecode.encode() if weights is not None else b'\0'
+    if whole is not None:
+        typecode = b'm'
+    # 'x' creates it with the usual permissions, and fails rather than sharing a name with another writer
+    temp_path = f'{path}.{secrets.token_hex(4)}.tmp'
+    f = open(temp_path, 'xb')
+    try:
+        with f:
+            f.write(HEADER.pack(MAGIC, VERSION, kind, len(offsets) - 1, len(targets), typecode))
+            f.write(array('q', offsets).tobytes())
+            f.write(array('q', targets).tobytes())
+            if weights is not None:
+                f.write(weights.tobytes())
+            if whole is not None:
+                f.write(bytes(whole) + bytes(-len(whole) % 8))
+            if labels is not None:
+                text = [label.encode() for label in labels]
+                label_offsets = array('q', [0])
+                for encoded in text:
+                    label_offsets.append(label_offsets[-1] + len(encoded))
+                f.write(label_offsets.tobytes())
+                f.write(b''.join(text))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_csr(path, kind: int, mmap=True):
+    """
+    Accepts a file path written by write_csr(), the graph kind it should hold, and whether to map the file instead of
+    reading it into memory
+    Mapped files are opened read-only, and the arrays returned are memoryviews over the shared pages
+
+    Returns a tuple of (offsets, targets, weights, whole, labels), weights None if the file has none, whole the
+    per-edge int flags of float64 weights or None, and labels a list of str or None
+    """
+    with open(path, 'rb') as f:
+        if mmap:
+            data = memoryview(mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ))
+        else:
+            data = memoryview(f.read())
+
+    if len(data) < HEADER.size:
+        raise ValueError(f'{path} is not a graph file')
+    magic, version, file_kind, v_count, e_count, typecode = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a graph file')
+    if version != VERSION:
+        raise ValueError(f'{path} has unsupported format version {version}')
+    if file_kind != kind:
+        raise ValueError(f'{path} holds a {"directed" if file_kind == DIRECTED else "undirected"} graph')
+    if typecode not in (b'\0', b'q', b'd', b'm'):
+        raise ValueError(f'{path} has unsupported weight type {typecode!r}')
+
+    # the header counts fix the size of every section, a file of any other length is truncated or corrupt
+    flag_bytes = -(-e_count // 8) * 8 if typecode == b'm' else 0
+    expected = HEADER.size + (v_count + 1 + e_count + (e_count if typecode != b'\0' else 0)) * 8 + flag_bytes
+    if len(data) > expected:
+        # a label section follows, its byte offsets give the length of the text after them
+        labels_start = expected + (v_count + 1) * 8
+        if len(data) >= labels_start:
+            expected = labels_start + struct.unpack_from('<q', data, labels_start - 8)[0]
+    if len(data) != expected:
+        raise ValueError(f'{path} is truncated or corrupt, expected {expected} bytes but found {len(data)}')
+
+    # each section is a whole number of 8 byte values, so the casts below never copy
+    position = HEADER.size
+
+    def section(count, code):
+        nonlocal position
+        view = data[position:position + count * 8].cast(code)
+        position += count * 8
+        return view
+
+    offsets = section(v_count + 1, 'q')
+    targets = section(e_count, 'q')
+    weights = section(e_count, 'd' if typecode == b'm' else typecode.decode()) if typecode != b'\0' else None
+    whole = None
+    if flag_bytes:
+        whole = data[position:position + e_count]
+        position += flag_bytes
+    labels = None
+    if position < len(data):
+        label_offsets = section(v_count + 1, 'q')
+        text = data[position:]
+        labels = [str(text[label_offsets[v]:label_offsets[v + 1]], 'utf-8') for v in range(v_count)]
+    return offsets, targets, weights, whole, labels
+
+
+def _number(text: str):
+    """
+    Accepts the text of a weight
+
+    Returns it as an int when it is whole, otherwise a float
+    """
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _parse_lines(lines, kind: int, delimiter):
+    """
+    Accepts a list of decoded lines, the graph kind and the field delimiter (None for any whitespace)
+    Blank lines and lines starting with # are skipped
+
+    Returns list of (src, dst[, weight]) int tuples for directed graphs or (u, v) str pairs for undirected ones
+    """
+    edges = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = [field.strip() for field in line.split(delimiter)]
+        if kind == UNDIRECTED:
+            edges.append((fields[0], fields[1]))
+        elif len(fields) > 2:
+            edges.append((int(fields[0]), int(fields[1]), _number(fields[2])))
+        else:
+            edges.append((int(fields[0]), int(fields[1])))
+    return edges
+
+
+def read_edge_list(path, kind: int, delimiter=None, batch_size=100000, chunk_size=1 << 20, progress=None):
+    """
+    Accepts a text edge list path (gzip compressed if it ends in .gz), the graph kind, an optional field delimiter
+    (default ',' if the first edge line has one, otherwise any whitespace, which covers tsv), how many edges to
+    collect per batch, how many bytes to read at a time, and an optional progress(bytes_read, edges_read) callback run
+    per batch
+    The file is read in fixed-size chunks, so memory stays bounded by the chunk and batch sizes whatever the file size
+
+    Returns a generator of edge lists, each at most batch_size long
+    """
+    opener = gzip.open if str(path).endswith('.gz') else open
+    detect = delimiter is None
+    bytes_read = 0
+    edges_read = 0
+    batch = []
+    with opener(path, 'rb') as f:
+        # a chunk can end mid-line, the partial line waits for the next chunk
+        tail = b''
+        while True:
+            chunk = f.read(chunk_size)
+            bytes_read += len(chunk)
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop() if chunk else b''
+            if detect:
+                # blank lines and comments say nothing about the delimiter, the first edge line decides it
+                first = next((line for line in lines if line.strip() and not line.lstrip().startswith(b'#')), None)
+                if first is not None:
+                    delimiter = ',' if b',' in first else None
+                    detect = False
+            batch.extend(_parse_lines([line.decode() for line in lines], kind, delimiter))
+            # a full batch goes out as soon as it is ready, whatever is left goes out at the end of the file
+            while len(batch) >= batch_size or (batch and not chunk):
+                edges_read += min(len(batch), batch_size)
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+                if progress is not None:
+                    progress(bytes_read, edges_read)
+            if not chunk:
+                break
@@ -0,0 +1,53 @@
+# Course: CS261 - Data Structures
+# Author: Tristan Howell
+# Assignment: Assignment 6: Graph Data Structures
+# Description: Serialize the changes made to a graph shared between threads
+
+from contextlib import contextmanager
+from functools import wraps
+
+
+def locked(method):
+    """
+    Accepts a graph method that changes the graph and wraps it to run while holding the graph's _lock, so changes from
+    different threads never interleave and a snapshot() is never taken halfway through one
+    The lock is re-entrant, so locked methods can call each other and run inside batch()
+
+    Returns the wrapped method
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            self._writers += 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                _finish(self)
+    return wrapper
+
+
+@contextmanager
+def writing(graph):
+    """
+    Accepts a graph and holds its _lock around a group of changes, the same way locked() does for one
+
+    Returns a context manager giving the graph
+    """
+    with graph._lock:
+        graph._writers += 1
+        try:
+            yield graph
+        finally:
+            _finish(graph)
+
+
+def _finish(graph) -> None:
+    """
+    Accepts a graph whose _lock is held and ends one change, recording the version the graph is left at once the
+    outermost change ends, so snapshot() can tell finished changes from ones still being made
+
+    No returns
+    """
+    graph._writers -= 1
+    if not graph._writers:
+        graph._published = graph._version
@@ -0,0 +1,176 @@
+# Course: CS261 - Data Structures
+# Author: Tristan Howell
+# Assignment: Assignment 6: Graph Data Structures
+# Description: Answer graph queries from asyncio code without blocking the event loop
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# queries that finish in about O(degree) or less, these never wait behind a slow query
+CHEAP_QUERIES = frozenset({'get_vertices', 'is_valid_path', 'connected', 'predecessors', 'in_degree', 'out_degree'})
+# cheap queries that are only cheap while the index they read is current, otherwise they rebuild it first
+REVERSE_QUERIES = frozenset({'predecessors', 'in_degree'})
+
+
+class GraphService:
+    """
+    Class to run queries on a DirectedGraph or UndirectedGraph from asyncio code
+    - queries run in worker threads, never on the event loop
+    - queries run on a snapshot() of the graph, so they never hold its lock and always see changes already made
+    - cheap and slow queries have their own bounded thread pools
+    - identical queries in flight at the same time share one computation
+    - changes go through one writer thread, in order
+    """
+
+    def __init__(self, graph, workers=4, cheap_workers=2, timeout=None):
+        """
+        Store the graph, a thread pool per lane of queries, and the queries in flight
+        timeout is the default number of seconds a caller waits for a query, None to wait as long as it takes
+        """
+        self.graph = graph
+        self.timeout = timeout
+        self._slow = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='graph-query')
+        self._cheap = ThreadPoolExecutor(max_workers=cheap_workers, thread_name_prefix='graph-cheap')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='graph-write')
+        # (method, args, kwargs, version) -> [future, number of callers waiting on it]
+        self._in_flight = {}
+        self.coalesced = 0
+
+    def __getattr__(self, name: str):
+        """
+        Accepts the name of a graph query, so service.dijkstra(5) works like query('dijkstra', 5)
+
+        Returns a coroutine function running that query
+        """
+        if name.startswith('_') or name == 'graph' or not callable(getattr(self.graph, name, None)):
+            raise AttributeError(name)
+        return partial(self.query, name)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Accepts no parameters and shuts the thread pools down, dropping queued work and letting running work finish
+
+        No returns
+        """
+        for executor in (self._cheap, self._slow, self._writer):
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, name: str, args, kwargs):
+        """
+        Accepts a query name and its arguments, and runs it on a snapshot of the graph, in a worker thread
+
+        Returns the result of the query
+        """
+        return getattr(self.graph.snapshot(), name)(*args, **kwargs)
+
+    def _is_cheap(self, name: str) -> bool:
+        """
+        Accepts a query name
+
+        Returns True if it is a cheap query and the index it reads is up to date, so it will not rebuild one
+        """
+        if name not in CHEAP_QUERIES:
+            return False
+        if name in REVERSE_QUERIES:
+            return getattr(self.graph, '_track_reverse', False)
+        if name == 'connected':
+            return not getattr(self.graph, '_uf_stale', True)
+        return True
+
+    def _forget(self, key, entry) -> None:
+        """
+        Accepts a query key and its in-flight entry, and stops sharing it unless a newer entry took its place
+
+        No returns
+        """
+        if self._in_flight.get(key) is entry:
+            del self._in_flight[key]
+
+    async def query(self, name: str, *args, timeout=None, **kwargs):
+        """
+        Accepts the name of a graph query, its arguments, and an optional timeout in seconds overriding the default
+        A caller that times out or is cancelled stops waiting without cancelling the computation for other callers
+        sharing it, and a computation nobody waits on any more is dropped if it has not started yet
+
+        Returns the result of the query, the same as calling it on graph.snapshot()
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._cheap if self._is_cheap(name) else self._slow
+        timeout = self.timeout if timeout is None else timeout
+        work = partial(self._run, name, args, kwargs)
+
+        # keyed on the last finished change rather than the version, which may count a change still being made: any
+        # computation in flight for the same key runs on a snapshot holding at least that change
+        key = (name, args, tuple(sorted(kwargs.items())), self.graph._published)
+        try:
+            entry = self._in_flight.get(key)
+        except TypeError:
+            # unhashable arguments cannot be shared
+            return await asyncio.wait_for(loop.run_in_executor(executor, work), timeout)
+
+        if entry is None:
+            entry = [loop.run_in_executor(executor, work), 0]
+            self._in_flight[key] = entry
+            entry[0].add_done_callback(lambda _: self._forget(key, entry))
+        else:
+            self.coalesced += 1
+
+        entry[1] += 1
+        try:
+            # shield keeps one caller giving up from cancelling the shared computation
+            return await asyncio.wait_for(asyncio.shield(entry[0]), timeout)
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not entry[0].done():
+                # only stops it if it is still queued, a running thread finishes and its result is dropped
+                entry[0].cancel()
+                self._forget(key, entry)
+
+    async def update(self, name: str, *args, **kwargs):
+        """
+        Accepts the name of a graph method that changes it, like add_edge, and its arguments, and runs it on the
+        writer thread after any changes already queued
+
+        Returns the result of the method
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, partial(getattr(self.graph, name), *args, **kwargs))
+
+
+# ------------------- BASIC TESTING -----------------------------------------
+
+
+if __name__ == '__main__':
+
+    from d_graph import DirectedGraph
+    from ud_graph import UndirectedGraph
+
+    async def main():
+        print("\nclass GraphService example")
+        print("--------------------------")
+        edges = [(0, 1, 10), (4, 0, 12), (1, 4, 15), (4, 3, 3),
+                 (3, 1, 5), (2, 1, 23), (3, 2, 7)]
+        async with GraphService(DirectedGraph(edges, storage='sparse')) as service:
+            results = await asyncio.gather(*(service.dijkstra(src % 2) for src in range(6)))
+            print(results, 'coalesced', service.coalesced)
+            await service.update('remove_edge', 4, 3)
+            print(await service.dijkstra(4), await service.in_degree(1))
+            try:
+                await service.query('all_pairs_shortest_paths', timeout=0)
+            except asyncio.TimeoutError:
+                print('timed out')
+
+        edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+        async with GraphService(UndirectedGraph(edges), timeout=5) as service:
+            print(await service.count_connected_components(), await service.connected('A', 'Q'))
+            await service.update('add_edge', 'H', 'Q')
+            print(await service.count_connected_components(), await service.connected('A', 'Q'))
+
+    asyncio.run(main())
@@ -4,7 +4,21 @@
 # Description: Implement an undirected graph data structure
 
 import heapq
+import threading
+from array import array
 from collections import deque
+from contextlib import contextmanager
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:
+    # only the bulk numpy paths need it
+    np = None
+
+from graph_cache import ResultCache, cached
+from graph_lock import locked, writing
+from graph_io import UNDIRECTED, read_csr, read_edge_list, write_csr
 
 class UndirectedGraph:
     """
@@ -17,85 +31,520 @@ class UndirectedGraph:
 
     def __init__(self, start_edges=None):
         """
-        Store graph info as adjacency list
-        DO NOT CHANGE THIS METHOD IN ANY WAY
+        Store graph info as adjacency list over interned vertex ids, along with a disjoint-set index of the connected
+        components
+        Each vertex name is mapped to a dense int id, and each id to an insertion-ordered dict of its neighbor ids
+        (values unused) so edge lookups are O(1) and traversals never touch the names
         """
-        self.adj_list = dict()
+        # two-way lookup between vertex names and ids, _ids also keeps the order vertices were added in
+        self._ids = dict()
+        self._labels = []
+        # ids of removed vertices, reused before new ones are handed out
+        self._free = []
+        self._adj = []
+        # neighbor ids of each id sorted by name, rebuilt lazily after that vertex's edges change
+        self._sorted = []
+
+        # union-find over the vertex ids, kept up to date on additions and rebuilt lazily after removals
+        self._uf_parent = []
+        self._uf_rank = []
+        self._uf_count = 0
+        self._uf_stale = False
+
+        # bumped on every change so cached results from before it are never returned
+        self._version = 0
+        self._cache = None
+        # held by every change, re-entrant so batch() can group several of them
+        self._lock = threading.RLock()
+        # depth of the changes in progress, and the version the last one to finish left the graph at
+        self._writers = 0
+        self._published = 0
+        # read-only copy handed out by snapshot(), reused until the graph next changes
+        self._snapshot = None
+        # per-id flags of the neighbor dicts the last snapshot shares with this graph, a flagged dict is copied before
+        # its first change so the snapshot never sees it change
+        self._shared = None
+        self._read_only = False
+        # the graph a snapshot was taken from, handed the component index the snapshot rebuilds
+        self._origin = None
+        # (version, sorted edge keys) last built by _edge_keys()
+        self._keys = None
 
         # populate graph with initial vertices and edges (if provided)
-        # before using, implement add_vertex() and add_edge() methods
         if start_edges is not None:
-            for u, v in start_edges:
-                self.add_edge(u, v)
+            self.add_edges_bulk(start_edges)
 
     def __str__(self):
         """
         Return content of the graph in human-readable form
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        out = [f'{v}: {self.adj_list[v]}' for v in self.adj_list]
+        out = [f'{v}: {self._names(self._adj[i])}' for v, i in self._ids.items()]
         out = '\n  '.join(out)
         if len(out) < 70:
             out = out.replace('\n  ', ', ')
             return f'GRAPH: {{{out}}}'
         return f'GRAPH: {{\n  {out}}}'
 
+    @property
+    def adj_list(self) -> dict:
+        """
+        Accepts no parameters, builds a fresh copy of the graph keyed by vertex name
+
+        Returns dict of each vertex to the list of its neighbors
+        """
+        return {v: self._names(self._adj[i]) for v, i in self._ids.items()}
+
     # ------------------------------------------------------------------ #
 
+    def _names(self, ids) -> []:
+        """
+        Accepts an iterable of vertex ids
+
+        Returns list of the matching vertex names
+        """
+        labels = self._labels
+        return [labels[i] for i in ids]
+
+    def _intern(self, v: str) -> int:
+        """
+        Accepts a str v and hands it an id if it does not have one yet
+
+        Returns the id of v
+        """
+        i = self._ids.get(v)
+        if i is not None:
+            return i
+        if self._free:
+            i = self._free.pop()
+            self._labels[i] = v
+            self._adj[i] = {}
+            self._sorted[i] = None
+        else:
+            i = len(self._labels)
+            self._labels.append(v)
+            self._adj.append({})
+            self._sorted.append(None)
+            self._uf_parent.append(i)
+            self._uf_rank.append(0)
+        self._ids[v] = i
+        self._version += 1
+        if not self._uf_stale:
+            self._uf_add(i)
+        return i
+
+    def _targets(self, i: int, ordered=True):
+        """
+        Accepts a vertex id and whether its neighbors are needed in name order
+        The sorted copy is kept per vertex and only rebuilt after that vertex's edges change, so traversals do not sort
+
+        Returns sequence of the neighbor ids of i
+        """
+        if not ordered:
+            return self._adj[i]
+        if self._sorted[i] is None:
+            self._sorted[i] = sorted(self._adj[i], key=self._labels.__getitem__)
+        return self._sorted[i]
+
+    def _edge_keys(self):
+        """
+        Accepts no parameters, and keeps the keys until the graph next changes so repeated calls do not rebuild them
+
+        Returns sorted numpy array of the u * n + v key of both directions of every edge over the interned ids, n being
+        the number of ids handed out
+        """
+        version = self._version
+        if self._keys is None or self._keys[0] != version:
+            n = len(self._labels)
+            degrees = np.fromiter((len(neighbors) for neighbors in self._adj), dtype=np.int64, count=n)
+            targets = np.fromiter(chain.from_iterable(self._adj), dtype=np.int64, count=int(degrees.sum()))
+            self._keys = (version, np.sort(np.repeat(np.arange(n), degrees) * n + targets))
+        return self._keys[1]
+
+    def _check_writable(self) -> None:
+        """
+        Accepts no parameters and refuses changes to a read-only copy taken by snapshot()
+
+        No returns
+        """
+        if self._read_only:
+            raise TypeError('graph is a read-only snapshot, change the graph it was taken from')
+
+    def _own(self, i: int) -> dict:
+        """
+        Accepts a vertex id and, if the last snapshot shares its neighbor dict, gives this graph its own copy
+
+        Returns the neighbor dict of i, safe to change
+        """
+        shared = self._shared
+        if shared is not None and i < len(shared) and shared[i]:
+            shared[i] = 0
+            self._adj[i] = dict(self._adj[i])
+        return self._adj[i]
+
+    def _uf_refresh(self) -> None:
+        """
+        Accepts no parameters and rebuilds the component index if a removal left it stale, under the lock so threads
+        sharing a snapshot rebuild it once and never read it half built
+
+        No returns
+        """
+        if self._uf_stale:
+            with self._lock:
+                if self._uf_stale:
+                    self._uf_rebuild()
+                    if self._origin is not None:
+                        self._uf_hand_back()
+
+    def _uf_hand_back(self) -> None:
+        """
+        Accepts no parameters, for a snapshot that just rebuilt its component index, and gives a copy of it to the
+        graph the snapshot was taken from if that graph has not changed since, so its queries stop rebuilding it too
+        The graph is skipped rather than waited for while another thread is changing it
+
+        No returns
+        """
+        origin = self._origin
+        parent, rank = list(self._uf_parent), list(self._uf_rank)
+        if not origin._lock.acquire(blocking=False):
+            return
+        try:
+            if origin._uf_stale and origin._version == self._version:
+                origin._uf_parent, origin._uf_rank, origin._uf_count = parent, rank, self._uf_count
+                origin._uf_stale = False
+        finally:
+            origin._lock.release()
+
+    def _uf_add(self, i: int) -> None:
+        """
+        Accepts a vertex id and places it in the component index as its own component
+
+        No returns
+        """
+        self._uf_parent[i] = i
+        self._uf_rank[i] = 0
+        self._uf_count += 1
+
+    def _uf_find(self, i: int) -> int:
+        """
+        Accepts a vertex id and follows its parents up to the root of its component, halving the path on the way
+
+        Returns the root id of the component
+        """
+        parent = self._uf_parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def _uf_union(self, u: int, v: int) -> None:
+        """
+        Accepts two vertex ids and merges their components, hanging the shorter tree under the taller one
+
+        No returns
+        """
+        u_root = self._uf_find(u)
+        v_root = self._uf_find(v)
+        if u_root == v_root:
+            return
+        if self._uf_rank[u_root] < self._uf_rank[v_root]:
+            u_root, v_root = v_root, u_root
+        self._uf_parent[v_root] = u_root
+        if self._uf_rank[u_root] == self._uf_rank[v_root]:
+            self._uf_rank[u_root] += 1
+        self._uf_count -= 1
+
+    def _uf_rebuild(self) -> None:
+        """
+        Accepts no parameters and rebuilds the component index from the current vertices and edges
+
+        No returns
+        """
+        self._uf_parent = list(range(len(self._labels)))
+        self._uf_rank = [0] * len(self._labels)
+        self._uf_count = len(self._ids)
+        for i in self._ids.values():
+            for neighbor in self._adj[i]:
+                self._uf_union(i, neighbor)
+        self._uf_stale = False
+
+    @locked
     def add_vertex(self, v: str) -> None:
         """
         Accepts a str v to add as a new vertex in the graph
 
         No returns
         """
-        if v in self.adj_list:
-            return
-        self.adj_list[v] = []
-        
+        self._check_writable()
+        self._intern(v)
+
+    @locked
     def add_edge(self, u: str, v: str) -> None:
         """
-        Accepts two strs representing vertices and links with an edge in each vertex's list
+        Accepts two strs representing vertices and links with an edge in each vertex's neighbors
 
         No returns
         """
+        self._check_writable()
         if u == v:
             return
 
-        self.add_vertex(u)
-        self.add_vertex(v)
-        if v not in self.adj_list[u]:
-            self.adj_list[u].append(v)
-        if u not in self.adj_list[v]:
-            self.adj_list[v].append(u)
+        u, v = self._intern(u), self._intern(v)
+        # re-adding an existing key keeps its original position
+        self._own(u)[v] = None
+        self._own(v)[u] = None
+        self._sorted[u] = self._sorted[v] = None
+        self._version += 1
+        if not self._uf_stale:
+            self._uf_union(u, v)
+
+    @locked
+    def add_edges_bulk(self, edges) -> None:
+        """
+        Accepts an iterable of (u, v) pairs, or a numpy array with those 2 columns, and links them all without the
+        per-edge method calls and component index updates of add_edge, skipping loops the same way
+        The component index is rebuilt once on the next query instead
+
+        No returns
+        """
+        self._check_writable()
+        if np is not None and isinstance(edges, np.ndarray):
+            if not edges.size:
+                edges = edges.reshape(0, 2)
+            elif edges.ndim != 2 or edges.shape[1] < 2:
+                raise ValueError(f'expected an array of (u, v) rows, got shape {edges.shape}')
+            # vertex names are strings, so numbers in the array name vertices by their text
+            edges = edges[:, :2].astype(str)
+            # drop loops for the whole array at once
+            edges = edges[edges[:, 0] != edges[:, 1]].tolist()
+
+        self._uf_stale = True
+        self._version += 1
+        ids, adj, intern, ordered = self._ids, self._adj, self._intern, self._sorted
+        own = self._own if self._shared is not None else adj.__getitem__
+        for u, v in edges:
+            if u == v:
+                continue
+            u = ids[u] if u in ids else intern(u)
+            v = ids[v] if v in ids else intern(v)
+            own(u)[v] = None
+            own(v)[u] = None
+            ordered[u] = ordered[v] = None
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Accepts edges in any form add_edges_bulk() takes
 
+        Returns a new UndirectedGraph holding those edges
+        """
+        graph = cls()
+        graph.add_edges_bulk(edges)
+        return graph
+
+    @classmethod
+    def from_edge_file(cls, path, delimiter=None, batch_size=100000, progress=None):
+        """
+        Accepts a text file of 'u v' lines (csv, tsv or whitespace separated, optionally .gz), and the delimiter,
+        batch size and progress callback options of graph_io.read_edge_list()
+        The file is streamed in batches through add_edges_bulk(), never held in memory whole
+
+        Returns a new UndirectedGraph holding those edges
+        """
+        graph = cls()
+        for batch in read_edge_list(path, UNDIRECTED, delimiter, batch_size, progress=progress):
+            graph.add_edges_bulk(batch)
+        return graph
+
+    @locked
     def remove_edge(self, v: str, u: str) -> None:
         """
-        Accepts two strs representing vertices and removes the edge link in each vertex's list
+        Accepts two strs representing vertices and removes the edge link in each vertex's neighbors
 
         No returns
         """
-        if v not in self.adj_list or u not in self.adj_list:
+        self._check_writable()
+        if v not in self._ids or u not in self._ids:
             return
 
-        if v not in self.adj_list[u] or u not in self.adj_list[v]:
+        v, u = self._ids[v], self._ids[u]
+        if u not in self._adj[v]:
             return
 
-        self.adj_list[v].remove(u)
-        self.adj_list[u].remove(v)
+        del self._own(v)[u]
+        del self._own(u)[v]
+        self._sorted[u] = self._sorted[v] = None
+        self._version += 1
+        # a removal can split a component, which union-find cannot undo
+        self._uf_stale = True
 
+    @locked
     def remove_vertex(self, v: str) -> None:
         """
         Accepts a str representing a vertex and removes it and all edges linking to it
 
         No returns
         """
-        if v not in self.adj_list:
+        self._check_writable()
+        if v not in self._ids:
             return
 
-        while self.adj_list[v]:
-            self.remove_edge(v, self.adj_list[v][0])
+        i = self._ids.pop(v)
+        # only the neighbors of v hold a link back to it
+        for neighbor in self._adj[i]:
+            del self._own(neighbor)[i]
+            self._sorted[neighbor] = None
+
+        self._adj[i] = {}
+        self._sorted[i] = None
+        self._labels[i] = None
+        self._free.append(i)
+        self._version += 1
+        self._uf_stale = True
+
+    def save(self, path) -> None:
+        """
+        Accepts a file path and writes the graph to it as compressed sparse row arrays over vertex positions, along
+        with the table of vertex names (see graph_io)
+        Vertex and neighbor order are kept, so a loaded graph prints the same
+
+        No returns
+        """
+        position = [0] * len(self._labels)
+        for pos, i in enumerate(self._ids.values()):
+            position[i] = pos
+        offsets = array('q', [0])
+        targets = array('q')
+        for i in self._ids.values():
+            targets.extend(position[neighbor] for neighbor in self._adj[i])
+            offsets.append(len(targets))
+        write_csr(path, UNDIRECTED, offsets, targets, labels=list(self._ids))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Accepts a file path written by save()
+        File positions become the vertex ids, and the names and neighbor dicts are copied out of the file so the loaded
+        graph can be changed, so unlike DirectedGraph.load() the file is read rather than mapped
+
+        Returns the loaded UndirectedGraph
+        """
+        offsets, targets, _, _, labels = read_csr(path, UNDIRECTED, mmap=False)
+        if labels is None:
+            raise ValueError(f'{path} has no vertex names')
+        graph = cls()
+        graph._labels = labels
+        graph._ids = {v: i for i, v in enumerate(labels)}
+        graph._adj = [dict.fromkeys(targets[offsets[i]:offsets[i + 1]]) for i in range(len(labels))]
+        graph._sorted = [None] * len(labels)
+        graph._uf_parent = list(range(len(labels)))
+        graph._uf_rank = [0] * len(labels)
+        graph._uf_stale = True
+        return graph
+
+    @contextmanager
+    def batch(self):
+        """
+        Accepts no parameters, for use as 'with graph.batch():' around a group of changes
+        Other threads' changes and snapshots wait until the block ends, so the group is published all at once
+
+        Returns a context manager giving the graph itself
+        """
+        with writing(self):
+            yield self
+
+    def snapshot(self):
+        """
+        Accepts no parameters and takes a read-only copy of the graph between changes rather than during one
+        The copy shares every neighbor dict with this graph, along with the result cache, and this graph copies a dict
+        only before its first change after the snapshot, so taking one costs copies of the per-vertex lists and the
+        work after it grows with what changes
+        Any number of threads can query the copy without locking while this graph keeps changing. The same copy is
+        handed out until the next change, and while another thread is in the middle of a change the last copy is
+        handed out instead of waiting for it, as long as it holds every change that has finished, so a change is in
+        every snapshot taken after it returns
+
+        Returns a read-only UndirectedGraph, this graph itself if it is already read-only
+        """
+        if self._read_only:
+            return self
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot._version == self._version:
+            return snapshot
+        # a copy missing only changes still being made is as good as one taken just before them
+        if snapshot is not None and snapshot._version >= self._published:
+            if not self._lock.acquire(blocking=False):
+                return snapshot
+        else:
+            self._lock.acquire()
+        try:
+            if self._snapshot is None or self._snapshot._version != self._version:
+                self._snapshot = self._share()
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def _share(self):
+        """
+        Accepts no parameters and builds the read-only copy for snapshot(), flagging the neighbor dicts it shares so
+        the next change to each is made on a copy
+
+        Returns the new read-only UndirectedGraph
+        """
+        snapshot = type(self)()
+        snapshot._ids = dict(self._ids)
+        snapshot._labels = list(self._labels)
+        snapshot._free = list(self._free)
+        snapshot._adj = list(self._adj)
+        self._shared = bytearray(b'\1') * len(self._adj)
+        # the sorted lists are replaced rather than changed in place, so they can be shared
+        snapshot._sorted = list(self._sorted)
+        # a stale component index is left for the copy to rebuild on first use (see _uf_refresh())
+        snapshot._uf_stale = self._uf_stale
+        if not self._uf_stale:
+            snapshot._uf_parent = list(self._uf_parent)
+            snapshot._uf_rank = list(self._uf_rank)
+            snapshot._uf_count = self._uf_count
+        snapshot._cache = self._cache
+        snapshot._keys = self._keys
+        snapshot._origin = self
+        snapshot._version = self._version
+        snapshot._read_only = True
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        """
+        Accepts no parameters
+
+        Returns the number of changes made to the graph so far
+        """
+        return self._version
+
+    def enable_cache(self, maxsize=128, policy='lru') -> None:
+        """
+        Accepts the most results to keep and the eviction policy ('lru' or 'fifo'), and starts caching
+        count_connected_components, has_cycle, get_edges and the numpy edge and degree results until the graph next
+        changes
+
+        No returns
+        """
+        self._cache = ResultCache(maxsize, policy)
 
-        self.adj_list.pop(v)
+    def disable_cache(self) -> None:
+        """
+        Accepts no parameters and stops caching, dropping every cached result
+
+        No returns
+        """
+        self._cache = None
+
+    def cache_info(self) -> dict:
+        """
+        Accepts no parameters
+
+        Returns dict of the cache hit, miss and eviction counters and its size, empty if caching is off
+        """
+        return self._cache.info() if self._cache is not None else {}
 
     def get_vertices(self) -> []:
         """
@@ -103,8 +552,9 @@ class UndirectedGraph:
 
         Returns list of vertices in the graph (any order)
         """
-        return [vertex for vertex in self.adj_list]
+        return list(self._ids)
 
+    @cached
     def get_edges(self) -> []:
         """
         Accepts no parameters
@@ -112,161 +562,279 @@ class UndirectedGraph:
         Return list of edges in the graph (any order)
         """
         edge_pairs = []
-        processed = []
-        for vertex in self.adj_list:
-            for edge in self.adj_list[vertex]:
-                if edge not in processed:
-                    edge_pairs.append((vertex, edge))
-            processed.append(vertex)
+        labels = self._labels
+        processed = bytearray(len(labels))
+        for i in self._ids.values():
+            for neighbor in self._adj[i]:
+                if not processed[neighbor]:
+                    edge_pairs.append((labels[i], labels[neighbor]))
+            processed[i] = 1
         return edge_pairs
 
+    @cached
+    def edge_arrays(self):
+        """
+        Accepts no parameters and lists each edge once as numpy columns of vertex positions (indexes into
+        get_vertices()), gathering every neighbor dict in one pass and dropping the second copy of each edge with a
+        single comparison instead of per-edge checks
+
+        Returns a tuple of (u, v) numpy int arrays with u < v
+        """
+        if np is None:
+            raise ImportError('edge_arrays() requires numpy')
+
+        order = list(self._ids.values())
+        position = np.zeros(len(self._labels), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        degrees = np.fromiter((len(self._adj[i]) for i in order), dtype=np.int64, count=len(order))
+        targets = np.fromiter(chain.from_iterable(self._adj[i] for i in order), dtype=np.int64,
+                              count=int(degrees.sum()))
+        u = np.repeat(np.arange(len(order)), degrees)
+        v = position[targets]
+        keep = u < v
+        return u[keep], v[keep]
+
+    @cached
+    def degree_array(self):
+        """
+        Accepts no parameters
+
+        Returns numpy int array of the degree of each vertex, in get_vertices() order
+        """
+        if np is None:
+            raise ImportError('degree_array() requires numpy')
+        return np.fromiter((len(self._adj[i]) for i in self._ids.values()), dtype=np.int64, count=len(self._ids))
+
+    def density(self) -> float:
+        """
+        Accepts no parameters
+
+        Returns the fraction of the n * (n - 1) / 2 possible edges that exist, 0.0 with fewer than 2 vertices
+        """
+        n = len(self._ids)
+        if n < 2:
+            return 0.0
+        return int(self.degree_array().sum()) / (n * (n - 1))
+
     def is_valid_path(self, path: []) -> bool:
         """
         Accepts a list path of vertices
 
         Return true if provided path is valid, False otherwise
         """
-        # empty or path of one vertex is valid
-        if not path:
-            return True
+        return self._first_invalid(path) == -1
 
-        if len(path) == 1 and path[0] not in self.adj_list:
-            return False
-
-        for position in range(len(path) - 1):
-            if path[position + 1] not in self.adj_list[path[position]]:
-                return False
-        return True
+    def _first_invalid(self, path) -> int:
+        """
+        Accepts a list path of vertices and walks it with one dict lookup per hop
 
-    def dfs(self, v_start, v_end=None) -> []:
+        Returns the position of the first vertex in path that is not in the graph or not linked to the one before, -1
+        if the whole path is valid
+        """
+        ids, adj = self._ids, self._adj
+        previous = None
+        for position, v in enumerate(path):
+            i = ids.get(v)
+            if i is None or (position and i not in adj[previous]):
+                return position
+            previous = i
+        return -1
+
+    def validate_paths(self, paths):
         """
-        Accepts a start and optional end vertex to perform a dfs on
+        Accepts an iterable of vertex lists, or a 2-D numpy str array of equal-length paths (one per row) which is
+        checked a whole column of hops at a time, looking each distinct name up once and each hop up by binary search
+        over the sorted edges, kept until the graph next changes
 
-        Return list of vertices visited during DFS search
-        Vertices are picked in alphabetical order
+        Returns for each path the position of the first vertex that breaks it (not in the graph, or not linked to the
+        one before), -1 if the path is valid, as a list or as a numpy array for numpy input
         """
-        visited = []
-        if v_start not in self.adj_list:
-            return visited
+        if np is None or not isinstance(paths, np.ndarray):
+            return [self._first_invalid(path) for path in paths]
+        if not paths.shape[1]:
+            return np.full(len(paths), -1)
+
+        names, inverse = np.unique(paths, return_inverse=True)
+        ids = np.array([self._ids.get(name, -1) for name in names.tolist()], dtype=np.int64)[inverse]
+        ids = ids.reshape(paths.shape)
+        missing = ids < 0
+
+        n = len(self._labels)
+        keys = self._edge_keys()
+        hops = ids[:, :-1] * n + ids[:, 1:]
+        found = np.searchsorted(keys, hops)
+        linked = keys[np.minimum(found, len(keys) - 1)] == hops if len(keys) else np.zeros(hops.shape, bool)
+
+        broken = missing
+        broken[:, 1:] |= ~linked
+        return np.where(broken.any(axis=1), broken.argmax(axis=1), -1)
+
+    def iter_dfs(self, v_start, max_depth=None, details=False, ordered=True):
+        """
+        Accepts a start vertex, an optional depth limit, details=True to also get each vertex's depth and parent, and
+        ordered=False to follow neighbors in insertion order when the visit order does not matter
+        Vertices come out lazily in the same order dfs() visits them, so the caller can stop at any point without
+        paying for the rest of the search
+        With max_depth, depth means the fewest hops found so far rather than depth in the search tree: a vertex first
+        reached the long way round is expanded again when a shorter path reaches it, so every vertex within max_depth
+        hops comes out (once, with the depth and parent it was first reached with)
+
+        Returns a generator of vertices, or of (vertex, depth, parent) tuples with details (parent None for v_start)
+        """
+        if v_start not in self._ids:
+            return
+        labels = self._labels
+        seen = bytearray(len(labels))
+        limited = max_depth is not None
+        # fewest hops each vertex has been expanded at, only needed with a depth limit
+        best = [max_depth + 1] * len(labels) if limited else None
         # "stack" operations for a list will be pop and append
-        # using a list to find the next *smallest vertex to follow
-        stack = []
-        stack.append(v_start)
+        # each entry also carries the depth and parent id it was reached with
+        stack = [(self._ids[v_start], 0, None)]
 
         while len(stack):
-            cur = stack.pop()
-            if cur not in visited:
-                visited.append(cur)
-                if cur == v_end:
-                    # the path when we found the end
-                    return visited
-                next_level = []
-                for neighbor in self.adj_list[cur]:
-                    if neighbor not in visited:
-                        next_level.append(neighbor)
-                next_level.sort()
-                # move "lowest" lexicographically sorted values to the top of the stack
-                stack += next_level[::-1]
-        return visited
-
+            cur, depth, parent = stack.pop()
+            if seen[cur]:
+                if not limited or depth >= best[cur]:
+                    continue
+            else:
+                seen[cur] = 1
+                if details:
+                    yield labels[cur], depth, None if parent is None else labels[parent]
+                else:
+                    yield labels[cur]
+            if limited:
+                best[cur] = depth
+                if depth == max_depth:
+                    continue
+            # push in reverse so the "lowest" lexicographically sorted values end up on the top of the stack
+            for neighbor in reversed(self._targets(cur, ordered)):
+                if not seen[neighbor] or (limited and depth + 1 < best[neighbor]):
+                    stack.append((neighbor, depth + 1, cur))
+
+    def iter_bfs(self, v_start, max_depth=None, details=False, ordered=True):
+        """
+        Accepts a start vertex, an optional depth limit, details=True to also get each vertex's hop distance and
+        parent, and ordered=False to follow neighbors in insertion order when the visit order does not matter
+        Vertices come out lazily in the same order bfs() visits them, so the caller can stop at any point without
+        paying for the rest of the search
 
-    def bfs(self, v_start, v_end=None) -> []:
+        Returns a generator of vertices, or of (vertex, hops, parent) tuples with details (parent None for v_start)
+        """
+        if v_start not in self._ids:
+            return
+        labels = self._labels
+        start = self._ids[v_start]
+        # vertices are marked seen when queued so each one enters the queue once
+        seen = bytearray(len(labels))
+        seen[start] = 1
+        queue = deque([(start, None)])
+        hops = 0
+
+        while queue:
+            # everything queued right now is on the same level
+            for _ in range(len(queue)):
+                cur, parent = queue.popleft()
+                if details:
+                    yield labels[cur], hops, None if parent is None else labels[parent]
+                else:
+                    yield labels[cur]
+                if hops == max_depth:
+                    continue
+                # "lowest" lexicographically sorted values leave the queue first
+                for neighbor in self._targets(cur, ordered):
+                    if not seen[neighbor]:
+                        seen[neighbor] = 1
+                        queue.append((neighbor, cur))
+            hops += 1
+
+    def dfs(self, v_start, v_end=None, ordered=True) -> []:
         """
-        Accepts a start and optional end vertex to perform a bfs on
+        Accepts a start and optional end vertex to perform a dfs on, ordered=False to skip the visit order guarantee
 
-        Return list of vertices visited during BFS search
+        Return list of vertices visited during DFS search
         Vertices are picked in alphabetical order
         """
         visited = []
-        if v_start not in self.adj_list:
-            return visited
-        # "stack" operations for a list will be pop and insert[0]
-        # using a list to find the next *smallest vertex to follow
-        stack = []
-
-        stack.append(v_start)
-
-        while len(stack):
-            cur = stack.pop()
-            if cur not in visited:
-                visited.append(cur)
-                if cur == v_end:
-                    # the path when we found the end
-                    return visited
-                next_level = []
-                for neighbor in self.adj_list[cur]:
-                    if neighbor not in visited:
-                        next_level.append(neighbor)
-                next_level.sort()
-                # move "lowest" lexicographically sorted values to the top of the stack
-                stack = next_level[::-1] + stack
+        for cur in self.iter_dfs(v_start, ordered=ordered):
+            visited.append(cur)
+            if cur == v_end:
+                # the path when we found the end
+                break
         return visited
 
+    def bfs(self, v_start, v_end=None, levels=False, ordered=True):
+        """
+        Accepts a start and optional end vertex to perform a bfs on, levels=True to also get hop distances, and
+        ordered=False to skip the visit order guarantee
+
+        Return list of vertices visited during BFS search, or when levels is True a dict of each visited vertex
+        to its hop distance from v_start (in visit order)
+        Vertices are picked in alphabetical order
+        """
+        visited = {}
+        for cur, hops, _ in self.iter_bfs(v_start, details=True, ordered=ordered):
+            visited[cur] = hops
+            if cur == v_end:
+                # the path when we found the end
+                break
+        return visited if levels else list(visited)
+
+    @cached
     def count_connected_components(self):
         """
         Accepts no parameters
 
         Return number of connected components in the graph
         """
-        components = 0
-        vertices = self.get_vertices()
-        visited = []
-        while len(visited) != len(vertices):
-            components += 1
-            # we just need to visit all the edges within this component in whatever order
-            stack = []
-
-            for i in vertices:
-                if i not in visited:
-                    # the first value not already seen to find any unattached components
-                    start = i
-                    break
-
-            stack.append(start)
-            while len(stack):
-                cur = stack.pop()
-                if cur not in visited:
-                    visited.append(cur)
-                    for neighbor in self.adj_list[cur]:
-                        if neighbor not in visited:
-                            stack.append(neighbor)
-        return components
+        self._uf_refresh()
+        return self._uf_count
+
+    def connected(self, u: str, v: str) -> bool:
+        """
+        Accepts two strs representing vertices
 
+        Return True if both vertices are in the same connected component, otherwise False
+        """
+        if u not in self._ids or v not in self._ids:
+            return False
+        self._uf_refresh()
+        return self._uf_find(self._ids[u]) == self._uf_find(self._ids[v])
+
+    @cached
     def has_cycle(self):
         """
         Accepts no parameters and checks for any loops within the graph
 
         Returns True if a loop is present, otherwise False
         """
-        visited = []
-        stack = []
+        seen = bytearray(len(self._labels))
 
-        for vertex in self.adj_list:
-            stack.append(vertex)
+        for vertex in self._ids.values():
+            if seen[vertex]:
+                continue
+            seen[vertex] = 1
+            # each vertex is pushed with the neighbor it was reached from
+            stack = [(vertex, -1)]
 
             while len(stack):
-                cur = stack.pop()
-                if cur not in visited:
-                    visited.append(cur)
-
-                    next_level = []
-                    for neighbor in self.adj_list[cur]:
-                        next_level.append(neighbor)
-                    next_level.sort()
-                    # move "lowest" lexicographically sorted values to the top of the stack
-                    stack += next_level[::-1]
-
-                if cur in stack:
-                    return True
-
-            visited = []
-            stack = []
+                cur, parent = stack.pop()
+                for neighbor in self._adj[cur]:
+                    if neighbor == parent:
+                        continue
+                    if seen[neighbor]:
+                        # reached a second way without going back over the same edge
+                        return True
+                    seen[neighbor] = 1
+                    stack.append((neighbor, cur))
 
         return False
 
 
 if __name__ == '__main__':
 
+    from itertools import islice
+
     print("\nPDF - method add_vertex() / add_edge example 1")
     print("----------------------------------------------")
     g = UndirectedGraph()
@@ -284,6 +852,35 @@ if __name__ == '__main__':
     print(g)
 
 
+    print("\nmethod from_edges() example")
+    print("---------------------------")
+    g = UndirectedGraph.from_edges(['AB', 'AC', 'BC', 'BD', 'CD', 'CE', 'DE', 'EE'])
+    print(g, g.count_connected_components())
+    if np is not None:
+        g = UndirectedGraph.from_edges(np.array([list(edge) for edge in ['AB', 'AC', 'BC', 'BD', 'CD', 'CE', 'DE']]))
+        print(g)
+
+
+    print("\nmethod save() / load() example")
+    print("------------------------------")
+    import tempfile
+    g = UndirectedGraph(['AB', 'AC', 'BC', 'BD', 'CD', 'CE', 'DE', 'XY'])
+    with tempfile.TemporaryDirectory() as tmp:
+        g.save(f'{tmp}/graph.bin')
+        g = UndirectedGraph.load(f'{tmp}/graph.bin')
+    print(g, g.count_connected_components())
+
+
+    print("\nmethod from_edge_file() example")
+    print("-------------------------------")
+    import gzip
+    with tempfile.TemporaryDirectory() as tmp:
+        with gzip.open(f'{tmp}/edges.tsv.gz', 'wt') as f:
+            f.write('A\tB\nA\tC\nB\tC\nB\tD\nC\tD\nC\tE\nD\tE\n')
+        g = UndirectedGraph.from_edge_file(f'{tmp}/edges.tsv.gz', batch_size=4)
+    print(g)
+
+
     print("\nPDF - method remove_edge() / remove_vertex example 1")
     print("----------------------------------------------------")
     g = UndirectedGraph(['AB', 'AC', 'BC', 'BD', 'CD', 'CE', 'DE'])
@@ -322,6 +919,12 @@ if __name__ == '__main__':
     for i in range(1, len(test_cases)):
         v1, v2 = test_cases[i], test_cases[-1 - i]
         print(f'{v1}-{v2} DFS:{g.dfs(v1, v2)} BFS:{g.bfs(v1, v2)}')
+    print('-----')
+    for case in test_cases:
+        print(f'{case} BFS LEVELS:{g.bfs(case, levels=True)}')
+    print('-----')
+    print('first 3 DFS from A:', list(islice(g.iter_dfs('A'), 3)))
+    print('BFS from B within 1 hop:', list(g.iter_bfs('B', max_depth=1, details=True)))
 
 
     print("\nPDF - method count_connected_components() example 1")
@@ -341,6 +944,17 @@ if __name__ == '__main__':
     print()
 
 
+    print("\nmethod connected() example")
+    print("--------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    for u, v in ['AH', 'AG', 'FQ', 'AZ']:
+        print(f'{u}-{v}', g.connected(u, v))
+    g.remove_edge('B', 'H')
+    g.add_edge('H', 'G')
+    print('AH', g.connected('A', 'H'), 'HQ', g.connected('H', 'Q'))
+
+
     print("\nPDF - method has_cycle() example 1")
     print("----------------------------------")
     edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
@@ -356,3 +970,53 @@ if __name__ == '__main__':
         u, v = edge
         g.add_edge(u, v) if command == 'add' else g.remove_edge(u, v)
         print('{:<10}'.format(case), g.has_cycle())
+
+
+    print("\nmethod enable_cache() / cache_info() example")
+    print("--------------------------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    g.enable_cache(maxsize=2)
+    for _ in range(3):
+        g.has_cycle(), g.count_connected_components()
+    print(g.cache_info())
+    g.remove_vertex('B')
+    print(g.version, g.has_cycle(), g.get_edges()[:3], g.cache_info())
+
+
+    print("\nmethod edge_arrays() / degree_array() / density() example")
+    print("--------------------------------------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    if np is None:
+        print('numpy is not installed')
+    else:
+        g.remove_vertex('C')
+        g.add_edge('Z', 'A')
+        print(g.get_vertices(), *g.edge_arrays(), g.degree_array(), round(g.density(), 2))
+
+
+    print("\nmethod validate_paths() example")
+    print("------------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    paths = [[], ['D'], ['Z'], ['E', 'A', 'C'], ['E', 'A', 'D'], ['B', 'H', 'B', 'C', 'Z']]
+    print(g.validate_paths(paths))
+    if np is not None:
+        print(g.validate_paths(np.array([['E', 'A', 'C'], ['E', 'A', 'D'], ['Q', 'G', 'F'], ['Z', 'A', 'E']])))
+
+
+    print("\nmethod batch() / snapshot() example")
+    print("----------------------------------")
+    edges = ['AE', 'AC', 'BE', 'CE', 'CD', 'CB', 'BD', 'ED', 'BH', 'QG', 'FG']
+    g = UndirectedGraph(edges)
+    snap = g.snapshot()
+    with g.batch():
+        g.remove_vertex('C')
+        g.add_edge('H', 'Q')
+    print(snap.count_connected_components(), snap.connected('H', 'Q'), snap.dfs('A'))
+    print(g.snapshot().count_connected_components(), g.snapshot().connected('H', 'Q'), g.snapshot().dfs('A'))
+    try:
+        snap.add_edge('A', 'Z')
+    except TypeError as error:
+        print(error)